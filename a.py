@@ -5,6 +5,35 @@ import re
 import whisper
 import yt_dlp
 import json
+import copy
+import argparse
+from transcript_archive import (
+    OUTPUT_FILES, OUTPUT_ARCHIVE, transcript_filename,
+    get_output_backend, get_default_archive,
+)
+from session_pool import get_ydl_pool
+from audio_cache import get_default_cache as get_default_audio_cache, get_download_dir, discard_audio_file
+from audio_fingerprint import (
+    SAMPLE_RATE, compute_fingerprint, fingerprint_cache_enabled,
+    get_default_index as get_default_fingerprint_index,
+)
+from language_gate import gate_settings, check_language, record_skipped_link
+from work_queue import DONE, SKIPPED, RETRY
+from quantized_model import int8_enabled, load_quantized_model
+from decode_profiles import (
+    PROFILES, DEFAULT_PROFILE, get_profile, apply_threading,
+    transcribe_options, batched_options,
+)
+
+def get_video_id_from_url(url):
+    """Extract video ID from YouTube URL."""
+    video_id_match = re.search(r'(?:v=|/)([a-zA-Z0-9_-]{11})(?:\S+)?', url)
+    if video_id_match:
+        return video_id_match.group(1)
+    return None
+
+# yt-dlp format selector; also part of the audio cache key
+AUDIO_FORMAT = 'bestaudio/best'
 
 def download_audio_from_youtube(url):
     """
@@ -14,6 +43,14 @@ def download_audio_from_youtube(url):
     """
     
     try:
+        # Reuse a previously downloaded copy: no network, no bot-detection risk
+        video_id = get_video_id_from_url(url)
+        cached = get_default_audio_cache().get(video_id, AUDIO_FORMAT) if video_id else None
+        if cached:
+            audio_path, cached_title = cached
+            print(f"Using cached audio: {audio_path}")
+            return audio_path, cached_title or f"video_{video_id}"
+        
         print(f"Downloading audio from link: {url}")
         
         # Add random delay to avoid bot detection
@@ -23,8 +60,10 @@ def download_audio_from_youtube(url):
         
         # Enhanced yt-dlp configuration with multiple anti-bot strategies
         ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': '%(title)s.%(ext)s',
+            'format': AUDIO_FORMAT,
+            # Named by video ID in a per-process folder: concurrent workers never share files
+            'outtmpl': '%(id)s.%(ext)s',
+            'paths': {'home': get_download_dir()},
             'extractaudio': True,
             'audioformat': 'mp3',
             'audioquality': '192K',
@@ -71,38 +110,30 @@ def download_audio_from_youtube(url):
             try:
                 print(f"Trying client configuration {i}/{len(client_configs)}: {client_config}")
                 
-                # Update extractor args for this attempt
-                current_opts = ydl_opts.copy()
+                # Update extractor args for this attempt (deep copy: the nested dicts are per-client)
+                current_opts = copy.deepcopy(ydl_opts)
                 current_opts['extractor_args']['youtube'].update(client_config)
                 
-                with yt_dlp.YoutubeDL(current_opts) as ydl:
+                # Reuse a pooled downloader for this client: cookies, extractor state,
+                # player JS and keep-alive connections carry over between videos
+                with get_ydl_pool().borrow(current_opts) as ydl:
                     try:
-                        # Extract info first to get the title
-                        print("Getting video info...")
-                        info = ydl.extract_info(url, download=False)
+                        # Download and get the title in one request
+                        print("Getting video info and downloading audio...")
+                        info = ydl.extract_info(url, download=True)
                         video_title = info.get('title', 'Unknown Video')
                         print(f"Video title: {video_title}")
                         
-                        # Download the audio
-                        print("Downloading audio...")
-                        ydl.download([url])
-                        
-                        # Find the downloaded file (yt-dlp may change the filename)
-                        import glob
-                        possible_files = glob.glob(f"{video_title[:50]}*")  # First 50 chars to avoid long filenames
-                        if not possible_files:
-                            # Try broader search
-                            possible_files = glob.glob("*.mp3") + glob.glob("*.m4a") + glob.glob("*.webm")
-                            if possible_files:
-                                # Get the most recently created file
-                                output_file = max(possible_files, key=os.path.getctime)
-                            else:
-                                print("Could not find downloaded audio file")
-                                continue  # Try next client config
-                        else:
-                            output_file = possible_files[0]
+                        # yt-dlp reports exactly which file it wrote
+                        downloads = info.get('requested_downloads') or [{}]
+                        output_file = downloads[0].get('filepath') or ydl.prepare_filename(info)
+                        if not os.path.exists(output_file):
+                            print("Could not find downloaded audio file")
+                            continue  # Try next client config
                         
                         print(f"✅ Success with client {client_config}!")
+                        if video_id:
+                            output_file = get_default_audio_cache().put(video_id, AUDIO_FORMAT, output_file, video_title)
                         print(f"Audio saved to file: {output_file}")
                         return output_file, video_title
                         
@@ -124,6 +155,61 @@ def download_audio_from_youtube(url):
         print(f"Error occurred while downloading video: {e}")
         return None, None
 
+# Decode profile used for transcription (fast / balanced / accurate)
+ACTIVE_PROFILE = os.environ.get("WHISPER_PROFILE", DEFAULT_PROFILE)
+
+# Loaded Whisper models, kept for the whole run instead of reloading per video
+_loaded_models = {}
+
+def load_whisper_model(model_name="medium"):
+    """
+    Loads a Whisper model once and reuses it for every following video.
+    """
+    quantized = int8_enabled()
+    key = (model_name, quantized)
+    if key not in _loaded_models:
+        print("Loading transcription model... (this may take time on first run)")
+        if quantized:
+            # CPU int8 dynamic quantization (WHISPER_INT8=1): less memory per worker
+            _loaded_models[key] = load_quantized_model(model_name)
+        else:
+            _loaded_models[key] = whisper.load_model(model_name)
+    return _loaded_models[key]
+
+def transcribe_audio_result(audio):
+    """
+    Transcribes audio (file path or decoded 16 kHz array) to Hebrew using the Whisper model.
+    Returns the full result dict (text and segments), or None on error.
+    Model and decoding settings come from the active profile (--profile / WHISPER_PROFILE).
+    Set WHISPER_BATCH_SIZE > 1 to decode several 30-second windows at once.
+    """
+    if audio is None:
+        return None
+        
+    try:
+        # 'balanced' uses the 'medium' model for good balance between speed and accuracy for Hebrew
+        # Consider the 'fast' profile for faster processing on GitHub Actions
+        profile = get_profile(ACTIVE_PROFILE)
+        apply_threading(profile)
+        model = load_whisper_model(profile["model"])
+        batch_size = int(os.environ.get("WHISPER_BATCH_SIZE", "1"))
+        
+        print(f"Starting transcription (profile: {profile['name']})")
+        if batch_size > 1:
+            # Same seek logic as model.transcribe, several windows per step (no conditioning on previous text)
+            from batched_transcribe import transcribe_batched
+            result = transcribe_batched(model, audio, batch_size=batch_size, language="he",
+                                        **batched_options(profile))
+        else:
+            # Transcribe the file specifying Hebrew language
+            result = model.transcribe(audio, language="he", **transcribe_options(profile, model))
+        
+        print("Transcription completed successfully.")
+        return result
+    except Exception as e:
+        print(f"Error occurred during transcription process: {e}")
+        return None
+
 def transcribe_audio_with_whisper(audio_file_path):
     """
     Transcribes the audio file to Hebrew using the Whisper model.
@@ -131,43 +217,68 @@ def transcribe_audio_with_whisper(audio_file_path):
     if not audio_file_path:
         return None
         
+    result = transcribe_audio_result(audio_file_path)
+    return result["text"] if result else None
+
+def reuse_known_transcript(audio, video_id):
+    """
+    Looks the audio up in the fingerprint index. If it is a re-upload of (or a cut from)
+    an already transcribed video, returns the matching time-sliced transcript.
+    """
+    if not fingerprint_cache_enabled():
+        return None
+        
     try:
-        print("Loading transcription model... (this may take time on first run)")
-        # Using 'medium' model for good balance between speed and accuracy for Hebrew
-        # Consider using 'small' for faster processing on GitHub Actions
-        model = whisper.load_model("medium") 
+        segments, match = get_default_fingerprint_index().reuse_transcript(audio, exclude=video_id)
+    except Exception as e:
+        print(f"Fingerprint lookup failed, transcribing normally: {e}")
+        return None
         
-        print(f"Starting transcription of file: {audio_file_path}")
-        # Transcribe the file specifying Hebrew language
-        result = model.transcribe(audio_file_path, language="he")
+    if match is None:
+        return None
         
-        transcript_text = result["text"]
-        print("Transcription completed successfully.")
+    print(f"Audio matches already transcribed video {match['video_id']} at {match['offset']:.1f}s "
+          f"(bit error rate {match['bit_error_rate']:.2f}) - reusing its transcript")
+    # Register this copy too, so cuts of it are recognized later
+    remember_fingerprint(audio, video_id, None, segments)
+    return "".join(segment["text"] for segment in segments)
+
+def remember_fingerprint(audio, video_id, video_title, segments):
+    """
+    Stores the audio fingerprint and transcript segments for future duplicate detection.
+    """
+    if not fingerprint_cache_enabled():
+        return
         
-        return transcript_text
+    try:
+        get_default_fingerprint_index().add(video_id, compute_fingerprint(audio), segments,
+                                            title=video_title, duration=len(audio) / SAMPLE_RATE)
     except Exception as e:
-        print(f"Error occurred during transcription process: {e}")
-        return None
+        print(f"Could not store audio fingerprint: {e}")
 
-def save_transcript_to_file(transcript, video_title):
+def save_transcript_to_file(transcript, video_title, video_id=None):
     """
-    Saves the transcript to a text file.
+    Saves the transcript to a text file and/or the packed archive,
+    depending on TRANSCRIPT_OUTPUT (files, archive or both).
     """
     if not transcript:
         return
         
-    # Create a clean filename
-    clean_title = video_title.replace(' ', '_').replace('|', '').replace('/', '_').replace('\\', '_').replace(':', '_').replace('?', '_').replace('*', '_').replace('<', '_').replace('>', '_').replace('"', '_')
-    filename = f"transcript_{clean_title}.txt"
+    backend = get_output_backend()
+    filename = None
     
-    # Ensure the filename is not too long
-    if len(filename) > 200:
-        filename = filename[:200] + ".txt"
+    if backend != OUTPUT_FILES:
+        entry = get_default_archive().add(video_id or video_title, transcript, title=video_title)
+        print(f"Transcript archived under key: {entry['video_id']}")
     
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(transcript)
+    if backend != OUTPUT_ARCHIVE:
+        # Create a clean filename
+        filename = transcript_filename(video_title)
         
-    print(f"Full transcript saved to file: {filename}")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(transcript)
+            
+        print(f"Full transcript saved to file: {filename}")
     return filename
 
 def get_safe_video_title(url):
@@ -189,7 +300,7 @@ def get_safe_video_title(url):
             }
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with get_ydl_pool().borrow(ydl_opts) as ydl:
             try:
                 info = ydl.extract_info(url, download=False)
                 title = info.get('title', 'Unknown Video')
@@ -224,9 +335,37 @@ def read_links_from_file(file_path):
         print(f"Error reading links file: {e}")
         return []
 
+def passes_language_gate(audio, url):
+    """
+    Cheap pre-check on a few sampled windows: is this Hebrew speech at all?
+    Skipped videos are recorded with their reason in skipped_links.txt.
+    """
+    settings = gate_settings()
+    if not settings["enabled"]:
+        return True
+        
+    try:
+        model_name = os.environ.get("LANGUAGE_GATE_MODEL") or get_profile(ACTIVE_PROFILE)["model"]
+        model = load_whisper_model(model_name)
+        result = check_language(model, audio,
+                                threshold=settings["threshold"], num_windows=settings["windows"])
+    except Exception as e:
+        # Never lose a video because the pre-check itself failed
+        print(f"Language check failed, transcribing anyway: {e}")
+        return True
+        
+    if result.passed:
+        print(f"Language check passed: {result.reason}")
+        return True
+        
+    print(f"Skipping video: {result.reason}")
+    record_skipped_link(url, result)
+    return False
+
 def process_youtube_link(url, processed_count, total_count):
     """
     Processes a single YouTube link: downloads audio, transcribes, and saves.
+    Returns DONE, SKIPPED (not Hebrew speech) or RETRY (download or transcription failed).
     """
     print(f"\n--- Processing video {processed_count}/{total_count} ---")
     print(f"URL: {url}")
@@ -236,48 +375,82 @@ def process_youtube_link(url, processed_count, total_count):
         audio_file, video_title = download_audio_from_youtube(url)
         
         if audio_file and video_title:
-            # Step 2: Transcribe audio
-            transcript = transcribe_audio_with_whisper(audio_file)
+            video_id = get_video_id_from_url(url) or video_title
+            
+            # Decode once: the duplicate check, language check and Whisper share the signal
+            audio = whisper.load_audio(audio_file)
+            
+            # Step 2: Reuse the transcript if this audio was already transcribed (re-upload, cut, mirror)
+            transcript = reuse_known_transcript(audio, video_id)
+            
+            if transcript is None:
+                # Step 3: Skip non-Hebrew or music-only videos before full transcription
+                if not passes_language_gate(audio, url):
+                    discard_audio_file(audio_file)
+                    return SKIPPED
+                
+                # Step 4: Transcribe audio
+                result = transcribe_audio_result(audio)
+                if not result or not result["text"].strip():
+                    print("Transcription failed, the video will be retried.")
+                    discard_audio_file(audio_file)
+                    return RETRY
+                transcript = result["text"]
+                remember_fingerprint(audio, video_id, video_title, result["segments"])
             
-            # Step 3: Save transcript
-            save_transcript_to_file(transcript, video_title)
+            # Step 5: Save transcript
+            save_transcript_to_file(transcript, video_title, video_id)
             
-            # Clean up temporary audio file
-            os.remove(audio_file)
-            print(f"Temporary audio file '{audio_file}' deleted.")
+            # Clean up temporary audio file (cached audio is kept for later runs)
+            if discard_audio_file(audio_file):
+                print(f"Temporary audio file '{audio_file}' deleted.")
             
-            return True
+            return DONE
         else:
             print("Failed to download audio, skipping this video.")
-            return False
+            return RETRY
             
     except Exception as e:
         print(f"Error processing video {url}: {e}")
-        return False
+        return RETRY
 
 # --- Main program section ---
 if __name__ == "__main__":
-    links_file = "links.txt"
+    parser = argparse.ArgumentParser(description="Download and transcribe YouTube videos to Hebrew")
+    parser.add_argument("--links", default="links.txt", help="File with one YouTube URL per line")
+    parser.add_argument("--int8", action="store_true",
+                        help="Use the int8 dynamic-quantized CPU model (same as WHISPER_INT8=1)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=ACTIVE_PROFILE,
+                        help="Decode profile: fast, balanced or accurate (default: WHISPER_PROFILE or balanced)")
+    args = parser.parse_args()
+    ACTIVE_PROFILE = args.profile
+    if args.int8:
+        os.environ["WHISPER_INT8"] = "1"
+    links_file = args.links
     
     # Read all links from the file
     youtube_links = read_links_from_file(links_file)
     
     if not youtube_links:
-        print("No links found in links.txt or file doesn't exist.")
+        print(f"No links found in {links_file} or file doesn't exist.")
         exit()
     
     total_links = len(youtube_links)
     print(f"Found {total_links} YouTube links to process.")
+    print(f"Decode profile: {ACTIVE_PROFILE} ({get_profile(ACTIVE_PROFILE)['model']} model)")
     
     # Process each link
     successful_count = 0
+    skipped_count = 0
     failed_count = 0
     
     for i, url in enumerate(youtube_links, 1):
-        success = process_youtube_link(url, i, total_links)
+        outcome = process_youtube_link(url, i, total_links)
         
-        if success:
+        if outcome == DONE:
             successful_count += 1
+        elif outcome == SKIPPED:
+            skipped_count += 1
         else:
             failed_count += 1
     
@@ -285,5 +458,12 @@ if __name__ == "__main__":
     print("\n--- Processing Complete ---")
     print(f"Total videos processed: {total_links}")
     print(f"Successful transcriptions: {successful_count}")
+    print(f"Skipped by the language check: {skipped_count}")
     print(f"Failed transcriptions: {failed_count}")
+    if get_default_audio_cache().enabled:
+        cache_stats = get_default_audio_cache().stats()
+        print(f"Audio cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['bytes'] / 1024 ** 2:.0f} MB in {cache_stats['entries']} files")
+    if os.path.exists("skipped_links.txt"):
+        print("Videos skipped by the language check are listed in skipped_links.txt")
 
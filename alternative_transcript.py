@@ -8,8 +8,8 @@ import os
 import time
 import random
 import re
-from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
+from session_pool import get_transcript_api
 
 def get_video_id_from_url(url):
     """Extract video ID from YouTube URL."""
@@ -37,7 +37,8 @@ def get_transcript_from_youtube(url):
         for lang in language_preferences:
             try:
                 print(f"Trying Hebrew language code: {lang}")
-                transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=[lang])
+                # Shared API client: one keep-alive HTTP session for the whole run
+                transcript = get_transcript_api().fetch(video_id, languages=[lang])
                 
                 if transcript:
                     # Format the transcript
@@ -46,7 +47,7 @@ def get_transcript_from_youtube(url):
                     
                     # Get video title from transcript metadata or use video ID
                     try:
-                        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+                        transcript_list = get_transcript_api().list(video_id)
                         video_title = f"video_{video_id}"  # Fallback
                         # Try to get a better title if possible
                     except:
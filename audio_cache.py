@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Size-capped on-disk audio cache.
+Downloaded audio is kept under a content address derived from the video ID
+and the requested format, so re-running with another model, profile or
+backend reads the audio locally instead of downloading it again.
+Least recently used files are evicted once the byte cap is exceeded.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_DIR = os.environ.get("AUDIO_CACHE_DIR", "audio_cache")
+DEFAULT_MAX_BYTES = int(float(os.environ.get("AUDIO_CACHE_MAX_BYTES", str(5 * 1024 ** 3))))
+DOWNLOAD_PARENT_DIR = os.environ.get("AUDIO_DOWNLOAD_DIR")  # default: system temp folder
+
+
+def cache_key(video_id, audio_format):
+    return hashlib.sha256(f"{video_id}\0{audio_format}".encode("utf-8")).hexdigest()
+
+
+def _atomic_write_json(path, data):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class AudioCache:
+    """
+    Each entry is <dir>/<key[:2]>/<key><ext> plus a <key>.json sidecar with the
+    video ID, format and title. The entry's modification time is its last use,
+    so several processes sharing the directory need no central index.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key[:2])
+
+    def _sidecar(self, key):
+        return os.path.join(self._entry_dir(key), key + ".json")
+
+    def get(self, video_id, audio_format):
+        """Return (audio_path, title) for a cached download, or None."""
+        if not self.enabled:
+            return None
+        key = cache_key(video_id, audio_format)
+        try:
+            with open(self._sidecar(key), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            path = os.path.join(self._entry_dir(key), key + meta["ext"])
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return path, meta.get("title")
+
+    def put(self, video_id, audio_format, source_path, title=None):
+        """
+        Move a downloaded file into the cache and return its cached path.
+        The file appears atomically (temp file + rename), so readers never see partial audio.
+        """
+        if not self.enabled:
+            return source_path
+
+        key = cache_key(video_id, audio_format)
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        ext = os.path.splitext(source_path)[1]
+        target = os.path.join(entry_dir, key + ext)
+
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, prefix=".tmp-", suffix=ext)
+        os.close(fd)
+        try:
+            try:
+                os.replace(source_path, tmp_path)
+            except OSError:
+                # Different filesystem: copy, then drop the original
+                shutil.copyfile(source_path, tmp_path)
+                os.remove(source_path)
+            os.replace(tmp_path, target)
+            # yt-dlp sets the file's mtime from Last-Modified (often the upload date);
+            # the cache uses mtime as last use, so mark the new entry as just used
+            os.utime(target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        _atomic_write_json(self._sidecar(key), {
+            "video_id": video_id,
+            "format": audio_format,
+            "title": title,
+            "ext": ext,
+            "size": os.path.getsize(target),
+            "stored": time.time(),
+        })
+        self.evict(keep=target)
+        return target
+
+    def contains_path(self, path):
+        """True if a file lives inside the cache (and must not be deleted by callers)."""
+        cache_root = os.path.abspath(self.directory) + os.sep
+        return os.path.abspath(path).startswith(cache_root)
+
+    def _audio_files(self):
+        """(mtime, size, path) of every cached audio file."""
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json") or name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # evicted by another process meanwhile
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def evict(self, keep=None):
+        """Remove least recently used files until the cache fits in max_bytes."""
+        files = sorted(self._audio_files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            key = os.path.splitext(os.path.basename(path))[0]
+            for victim in (os.path.join(os.path.dirname(path), key + ".json"), path):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        return total
+
+    def stats(self):
+        files = self._audio_files()
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(files),
+            "bytes": sum(size for _, size, _ in files),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Process-wide cache (AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES; 0 disables)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AudioCache()
+    return _default_cache
+
+
+_download_dir = None
+
+
+def get_download_dir():
+    """
+    Private per-process folder for fresh downloads. Several workers may share
+    one working directory (docker compose mounts ./ into every container), so
+    downloads never land where another worker could pick them up.
+    """
+    global _download_dir
+    if _download_dir is None:
+        if DOWNLOAD_PARENT_DIR:
+            os.makedirs(DOWNLOAD_PARENT_DIR, exist_ok=True)
+        _download_dir = tempfile.mkdtemp(prefix="yt_audio_", dir=DOWNLOAD_PARENT_DIR)
+        atexit.register(shutil.rmtree, _download_dir, True)
+    return _download_dir
+
+
+def discard_audio_file(path):
+    """Delete a temporary audio file unless it is owned by the cache."""
+    if get_default_cache().contains_path(path):
+        return False
+    os.remove(path)
+    return True
+
+
+# Main execution
+if __name__ == "__main__":
+    cache = get_default_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.max_bytes = 0
+        cache.evict()
+        print(f"🗑️  Cleared {cache.directory}")
+    stats = cache.stats()
+    print(f"📦 Audio cache {cache.directory}: {stats['entries']} files, "
+          f"{stats['bytes'] / 1024 ** 2:.1f} MB of {stats['max_bytes'] / 1024 ** 2:.0f} MB")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Audio fingerprint cache for re-uploaded or duplicate videos.
+Computes a compact CPU-only fingerprint (one 32-bit sub-fingerprint per
+64 ms, from band-energy differences of the 16 kHz signal) and stores it with
+the transcript segments. A new video whose audio matches a stored one, fully
+or as a contained sub-span (a short cut from an episode), reuses the
+time-sliced transcript instead of running Whisper. A cut can start anywhere,
+not just on the stored 64 ms frame grid, so an excerpt of the new audio is
+fingerprinted at several sub-frame shifts; the best aligned one is then
+verified once against the fingerprint of the whole audio.
+"""
+
+import os
+import sys
+import json
+import glob
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 2048  # 128 ms analysis window
+HOP_SIZE = 1024    # one sub-fingerprint every 64 ms
+NUM_BANDS = 33     # 33 bands -> 32 bits per frame
+MIN_FREQ = 300
+MAX_FREQ = 2000
+
+MAX_BIT_ERROR_RATE = 0.25  # same audio re-encoded stays well below this, unrelated audio sits near 0.5
+QUERY_SHIFTS = 16          # query alignments per hop: worst misalignment is HOP_SIZE / 32 (2 ms)
+QUERY_EXCERPT_SECONDS = 60 # only this much of the new audio is fingerprinted at every shift
+CHUNK_FRAMES = 4096        # frames per FFT block (~35 MB), keeps memory flat for long audio
+SAMPLED_QUERY_FRAMES = 400
+MIN_VOTES = 3
+COVERAGE_TOLERANCE = 2.0   # seconds the query may stick out of the matched reference
+
+FRAME_SECONDS = HOP_SIZE / SAMPLE_RATE
+
+
+def _band_matrix():
+    """(FFT bins x bands) matrix summing power into log-spaced bands."""
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / SAMPLE_RATE)
+    edges = np.geomspace(MIN_FREQ, MAX_FREQ, NUM_BANDS + 1)
+    matrix = np.zeros((len(freqs), NUM_BANDS), dtype=np.float32)
+    for band in range(NUM_BANDS):
+        matrix[(freqs >= edges[band]) & (freqs < edges[band + 1]), band] = 1.0
+    return matrix
+
+
+_BANDS = _band_matrix()
+_WINDOW = np.hanning(FRAME_SIZE).astype(np.float32)
+_BIT_WEIGHTS = (1 << np.arange(NUM_BANDS - 1, dtype=np.uint64)).astype(np.uint64)
+
+
+def compute_fingerprint(audio):
+    """Return a uint32 array of sub-fingerprints for a 16 kHz float32 signal."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < FRAME_SIZE + HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32)
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME_SIZE)[::HOP_SIZE]
+    energy = np.empty((len(frames), NUM_BANDS), dtype=np.float32)
+    for start in range(0, len(frames), CHUNK_FRAMES):
+        spectrum = np.fft.rfft(frames[start:start + CHUNK_FRAMES] * _WINDOW, axis=1).astype(np.complex64)
+        energy[start:start + CHUNK_FRAMES] = (spectrum.real ** 2 + spectrum.imag ** 2) @ _BANDS
+
+    # Bit m of frame n: sign of the band-energy difference, differenced over time
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return (bits.astype(np.uint64) @ _BIT_WEIGHTS).astype(np.uint32)
+
+
+def _popcount(values):
+    """Number of set bits per uint32 element."""
+    values = values.astype(np.uint32)
+    return np.unpackbits(values.view(np.uint8)).reshape(len(values), 32).sum(axis=1)
+
+
+def bit_error_rate(a, b):
+    return float(_popcount(np.bitwise_xor(a, b)).sum()) / (32 * len(a))
+
+
+def slice_segments(segments, start, end):
+    """Segments overlapping [start, end], shifted so that start becomes 0."""
+    sliced = []
+    for segment in segments:
+        if segment["end"] <= start or segment["start"] >= end:
+            continue
+        sliced.append({
+            "start": round(max(segment["start"], start) - start, 2),
+            "end": round(min(segment["end"], end) - start, 2),
+            "text": segment["text"],
+        })
+    return sliced
+
+
+class FingerprintIndex:
+    """
+    Fingerprints stored next to the transcripts: <directory>/<video_id>.fp.npy
+    plus <video_id>.json (title, duration, segments). Lookups use one sorted
+    array of every stored sub-fingerprint, built lazily.
+    """
+
+    def __init__(self, directory="fingerprints"):
+        self.directory = directory
+        self._fingerprints = {}
+        self._metadata = {}
+        self._lookup = None
+        if os.path.isdir(directory):
+            for path in glob.glob(os.path.join(directory, "*.fp.npy")):
+                video_id = os.path.basename(path)[:-len(".fp.npy")]
+                meta_path = os.path.join(directory, video_id + ".json")
+                if os.path.exists(meta_path):
+                    self._fingerprints[video_id] = np.load(path)
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        self._metadata[video_id] = json.load(f)
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def add(self, video_id, fingerprint, segments, title=None, duration=None):
+        """Store a fingerprint with the transcript segments it belongs to."""
+        os.makedirs(self.directory, exist_ok=True)
+        metadata = {
+            "video_id": video_id,
+            "title": title or video_id,
+            "duration": duration if duration is not None else len(fingerprint) * FRAME_SECONDS,
+            "segments": [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments],
+        }
+        np.save(os.path.join(self.directory, video_id + ".fp.npy"), fingerprint)
+        with open(os.path.join(self.directory, video_id + ".json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        self._fingerprints[video_id] = fingerprint
+        self._metadata[video_id] = metadata
+        self._lookup = None
+
+    def _build_lookup(self):
+        ids = list(self._fingerprints)
+        values = [self._fingerprints[v] for v in ids]
+        if not values:
+            self._lookup = (np.zeros(0, np.uint32), np.zeros(0, np.int64), np.zeros(0, np.int64), ids)
+            return
+        all_values = np.concatenate(values)
+        owners = np.concatenate([np.full(len(v), i, dtype=np.int64) for i, v in enumerate(values)])
+        positions = np.concatenate([np.arange(len(v), dtype=np.int64) for v in values])
+        order = np.argsort(all_values, kind="stable")
+        self._lookup = (all_values[order], owners[order], positions[order], ids)
+
+    def find(self, fingerprint, exclude=None):
+        """
+        Find a stored video containing this audio.
+        Returns {"video_id", "offset", "bit_error_rate"} or None.
+        """
+        match = self._match(fingerprint, exclude)
+        if match is None:
+            return None
+        video_id, offset, ber = match
+        return {"video_id": video_id, "offset": max(offset, 0) * FRAME_SECONDS, "bit_error_rate": ber}
+
+    def _match(self, fingerprint, exclude=None):
+        """(video_id, frame offset of the query in the video, bit error rate) or None."""
+        if len(fingerprint) == 0 or not self._fingerprints:
+            return None
+        if self._lookup is None:
+            self._build_lookup()
+        values, owners, positions, ids = self._lookup
+
+        # Vote for (video, frame offset) using exact sub-fingerprint hits on sampled query frames
+        step = max(1, len(fingerprint) // SAMPLED_QUERY_FRAMES)
+        votes = {}
+        for query_pos in range(0, len(fingerprint), step):
+            value = fingerprint[query_pos]
+            lo = np.searchsorted(values, value, side="left")
+            hi = np.searchsorted(values, value, side="right")
+            if hi - lo > 50:
+                continue  # silence / constant tones match everywhere
+            for owner, ref_pos in zip(owners[lo:hi], positions[lo:hi]):
+                key = (int(owner), int(ref_pos) - query_pos)
+                votes[key] = votes.get(key, 0) + 1
+
+        candidates = sorted(votes.items(), key=lambda item: -item[1])[:10]
+        for (owner, offset), count in candidates:
+            if count < MIN_VOTES:
+                break
+            video_id = ids[owner]
+            if video_id == exclude:
+                continue
+            ber = self._verify(video_id, fingerprint, offset)
+            if ber is not None:
+                return video_id, offset, ber
+        return None
+
+    def _verify(self, video_id, fingerprint, offset):
+        """
+        Bit error rate of the query placed at frame offset in a stored video, or
+        None if it does not lie inside the video or does not match.
+        """
+        reference = self._fingerprints[video_id]
+        tolerance = int(COVERAGE_TOLERANCE / FRAME_SECONDS)
+
+        # The query must lie inside the reference (full match or contained sub-span)
+        if offset < -tolerance or offset + len(fingerprint) > len(reference) + tolerance:
+            return None
+        ref_start = max(offset, 0)
+        ref_end = min(offset + len(fingerprint), len(reference))
+        if ref_end <= ref_start:
+            return None
+        query_part = fingerprint[ref_start - offset:ref_end - offset]
+        ber = bit_error_rate(query_part, reference[ref_start:ref_end])
+        return ber if ber <= MAX_BIT_ERROR_RATE else None
+
+    def find_audio(self, audio, exclude=None):
+        """
+        Like find, for a signal that may start anywhere relative to the stored
+        frame grid. A QUERY_EXCERPT_SECONDS excerpt from the middle of the audio
+        is tried at QUERY_SHIFTS sub-hop alignments; the best one is verified
+        with a single fingerprint of the whole audio on the same alignment.
+        The offset is in seconds of the stored video at which this audio starts.
+        """
+        if len(self) == 0:
+            return None
+        audio = np.asarray(audio, dtype=np.float32)
+        excerpt_samples = QUERY_EXCERPT_SECONDS * SAMPLE_RATE
+        excerpt_start = max(0, (len(audio) - excerpt_samples) // 2)
+        excerpt = audio[excerpt_start:excerpt_start + excerpt_samples + HOP_SIZE]
+
+        best = None
+        for shift in range(0, HOP_SIZE, HOP_SIZE // QUERY_SHIFTS):
+            match = self._match(compute_fingerprint(excerpt[shift:]), exclude=exclude)
+            if match is not None and (best is None or match[2] < best[0][2]):
+                best = match, excerpt_start + shift
+        if best is None:
+            return None
+
+        # Frame 0 of the excerpt is sample `start` of the audio: put the whole
+        # audio on the same grid and check that all of it matches
+        (video_id, offset, _), start = best
+        grid_shift = start % HOP_SIZE
+        offset -= start // HOP_SIZE
+        ber = self._verify(video_id, compute_fingerprint(audio[grid_shift:]), offset)
+        if ber is None:
+            return None
+        return {"video_id": video_id,
+                "offset": max(0.0, offset * FRAME_SECONDS - grid_shift / SAMPLE_RATE),
+                "bit_error_rate": ber}
+
+    def reuse_transcript(self, audio, exclude=None):
+        """
+        If this audio is already known, return (segments, match) with segment
+        times relative to the new audio; otherwise (None, None).
+        """
+        if len(self) == 0:
+            return None, None
+        match = self.find_audio(audio, exclude=exclude)
+        if match is None:
+            return None, None
+        duration = len(audio) / SAMPLE_RATE
+        segments = slice_segments(self._metadata[match["video_id"]]["segments"],
+                                  match["offset"], match["offset"] + duration)
+        return segments, match
+
+
+_default_index = None
+
+
+def fingerprint_cache_enabled():
+    return os.environ.get("FINGERPRINT_CACHE", "1").lower() not in ("0", "false", "off", "no")
+
+
+def get_default_index():
+    """Process-wide index (FINGERPRINT_DIR, default: ./fingerprints)."""
+    global _default_index
+    if _default_index is None:
+        _default_index = FingerprintIndex(os.environ.get("FINGERPRINT_DIR", "fingerprints"))
+    return _default_index
+
+
+# Main execution
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python audio_fingerprint.py AUDIO_FILE [AUDIO_FILE ...]")
+        print("Checks each file against the fingerprint index.")
+        sys.exit(1)
+
+    import whisper
+
+    index = get_default_index()
+    print(f"📇 {len(index)} fingerprints in {index.directory}")
+    for path in sys.argv[1:]:
+        segments, match = index.reuse_transcript(whisper.load_audio(path))
+        if match is None:
+            print(f"❌ {path}: no match")
+        else:
+            print(f"✅ {path}: matches {match['video_id']} at {match['offset']:.1f}s "
+                  f"(bit error rate {match['bit_error_rate']:.3f}, {len(segments)} segments)")
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Batched multi-window Whisper decoding.
+Each source (or each span of a long source, cut at a quiet point) is a lane
+that is decoded with model.transcribe's seek logic: after every window the
+lane resumes at its last complete timestamp, so speech running over a window
+edge is decoded again in the next window instead of being dropped. One window
+from each of several lanes goes through the encoder and decoder together.
+With one lane per source this gives the segments of
+model.transcribe(..., condition_on_previous_text=False).
+"""
+
+import sys
+import time
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+import torch
+import whisper
+from whisper.audio import SAMPLE_RATE, HOP_LENGTH, N_SAMPLES, N_FRAMES
+from whisper.tokenizer import get_tokenizer
+
+# Same defaults as model.transcribe
+TEMPERATURE_FALLBACK = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+TIME_PRECISION = 0.02  # seconds per timestamp token
+
+MIN_LANE_SECONDS = 300    # don't split a source into spans shorter than this
+CUT_SEARCH_SECONDS = 10   # look this far around a nominal cut for the quietest point
+CUT_FRAME_SECONDS = 0.1
+
+
+@dataclass
+class AudioLane:
+    """A span of one source, decoded window by window like model.transcribe."""
+    source: str
+    index: int      # position of the span within its source
+    offset: float   # seconds from the start of the source
+    mel: torch.Tensor  # log-mel of the span plus 30 s of padding, as in model.transcribe
+    content_frames: int
+    language: str = None
+    prompt: str = None  # initial prompt, used for the first window only
+    seek: int = 0
+    segments: list = field(default_factory=list)
+
+    @property
+    def done(self):
+        return self.seek >= self.content_frames
+
+    @property
+    def options_key(self):
+        return self.language, self.prompt if self.seek == 0 else None
+
+
+def _quietest_point(audio, center):
+    """Sample index in the middle of the quietest short frame near center."""
+    frame = int(CUT_FRAME_SECONDS * SAMPLE_RATE)
+    low = max(0, center - CUT_SEARCH_SECONDS * SAMPLE_RATE)
+    high = min(len(audio), center + CUT_SEARCH_SECONDS * SAMPLE_RATE)
+    count = (high - low) // frame
+    if count < 2:
+        return center
+    frames = np.asarray(audio[low:low + count * frame], dtype=np.float32).reshape(count, frame)
+    quietest = int(np.argmin((frames ** 2).mean(axis=1)))
+    return low + quietest * frame + frame // 2
+
+
+def split_into_lanes(model, audio, source, lanes=1, language=None, prompt=None):
+    """
+    Cut a 16 kHz signal (path or array) into up to `lanes` spans of at least
+    MIN_LANE_SECONDS, splitting at the quietest point near each nominal cut so
+    no word is cut in half. Each span gets its own log-mel and seek state.
+    """
+    if isinstance(audio, str):
+        audio = whisper.load_audio(audio)
+
+    count = max(1, min(lanes, int(len(audio) / SAMPLE_RATE // MIN_LANE_SECONDS)))
+    cuts = [0] + [_quietest_point(audio, k * len(audio) // count) for k in range(1, count)] + [len(audio)]
+
+    result = []
+    for index, (start, end) in enumerate(zip(cuts, cuts[1:])):
+        mel = whisper.log_mel_spectrogram(audio[start:end], model.dims.n_mels, padding=N_SAMPLES)
+        result.append(AudioLane(
+            source=source,
+            index=index,
+            offset=start / SAMPLE_RATE,
+            mel=mel,
+            content_frames=mel.shape[-1] - N_FRAMES,
+            language=language,
+            prompt=prompt,
+        ))
+    return result
+
+
+def _decoding_options(model, language, prompt, temperature, beam_size=None, best_of=None):
+    if temperature > 0:
+        beam_size = None
+    else:
+        best_of = None
+    return whisper.DecodingOptions(
+        task="transcribe",
+        language=language,
+        prompt=prompt,
+        temperature=temperature,
+        beam_size=beam_size,
+        best_of=best_of,
+        fp16=model.device.type == "cuda",
+    )
+
+
+def _needs_fallback(result):
+    """Same quality checks model.transcribe applies before retrying at a higher temperature."""
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        return False  # silence: accept, it is skipped later
+    return (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+            or result.avg_logprob < LOGPROB_THRESHOLD)
+
+
+def _advance(model, lane, result, segment_size):
+    """Add one window's segments to a lane and move its seek, following model.transcribe."""
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=model.num_languages,
+        language=result.language,
+        task="transcribe",
+    )
+    timestamp_begin = tokenizer.timestamp_begin
+    input_stride = N_FRAMES // model.dims.n_audio_ctx
+    time_offset = float(lane.seek * HOP_LENGTH / SAMPLE_RATE)
+
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and not result.avg_logprob > LOGPROB_THRESHOLD:
+        lane.seek += segment_size  # silence
+        return
+
+    tokens = result.tokens
+    is_timestamp = [token >= timestamp_begin for token in tokens]
+    single_timestamp_ending = is_timestamp[-2:] == [False, True]
+    consecutive = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+
+    pieces = []
+    if consecutive:
+        slices = consecutive + ([len(tokens)] if single_timestamp_ending else [])
+        last_slice = 0
+        for current_slice in slices:
+            sliced = tokens[last_slice:current_slice]
+            pieces.append((
+                time_offset + (sliced[0] - timestamp_begin) * TIME_PRECISION,
+                time_offset + (sliced[-1] - timestamp_begin) * TIME_PRECISION,
+                sliced,
+            ))
+            last_slice = current_slice
+        if single_timestamp_ending:
+            seek_delta = segment_size
+        else:
+            # The window ended inside a segment: resume at the last complete timestamp
+            seek_delta = (tokens[last_slice - 1] - timestamp_begin) * input_stride
+    else:
+        duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+        timestamps = [token for token, stamp in zip(tokens, is_timestamp) if stamp]
+        if timestamps and timestamps[-1] != timestamp_begin:
+            duration = (timestamps[-1] - timestamp_begin) * TIME_PRECISION
+        pieces.append((time_offset, time_offset + duration, tokens))
+        seek_delta = segment_size
+
+    for start, end, sliced in pieces:
+        text = tokenizer.decode([token for token in sliced if token < tokenizer.eot])
+        if start != end and text.strip():
+            lane.segments.append({"start": lane.offset + start, "end": lane.offset + end, "text": text})
+    lane.seek += seek_delta
+
+
+def _decode_step(model, lanes, options_key, beam_size, best_of, temperatures):
+    """Decode the next window of each lane together, with per-window temperature fallback."""
+    language, prompt = options_key
+    sizes = [min(N_FRAMES, lane.content_frames - lane.seek) for lane in lanes]
+    mel = torch.stack([
+        whisper.pad_or_trim(lane.mel[:, lane.seek:lane.seek + size], N_FRAMES)
+        for lane, size in zip(lanes, sizes)
+    ]).to(model.device)
+
+    results = [None] * len(lanes)
+    pending = list(range(len(lanes)))
+    for step, temperature in enumerate(temperatures):
+        options = _decoding_options(model, language, prompt, temperature, beam_size, best_of)
+        decoded = whisper.decode(model, mel[pending], options)
+        retry = []
+        for i, result in zip(pending, decoded):
+            results[i] = result
+            if step < len(temperatures) - 1 and _needs_fallback(result):
+                retry.append(i)
+        pending = retry
+        if not pending:
+            break
+
+    for lane, size, result in zip(lanes, sizes, results):
+        _advance(model, lane, result, size)
+        lane.language = lane.language or result.language
+
+
+def iter_decode_steps(model, lanes, batch_size=8, beam_size=None, best_of=None,
+                      temperatures=TEMPERATURE_FALLBACK):
+    """
+    Decode lanes until all are done, yielding the lanes after every batched step
+    (callers can publish partial segments or release a model lock in between).
+    A batch only mixes lanes with the same language and prompt, since
+    DecodingOptions is shared across a batch.
+    """
+    while True:
+        active = [lane for lane in lanes if not lane.done]
+        if not active:
+            return
+        key = active[0].options_key
+        batch = [lane for lane in active if lane.options_key == key][:batch_size]
+        _decode_step(model, batch, key, beam_size, best_of, temperatures)
+        yield lanes
+
+
+def decode_lanes(model, lanes, batch_size=8, **decode_kwargs):
+    for _ in iter_decode_steps(model, lanes, batch_size, **decode_kwargs):
+        pass
+    return lanes
+
+
+def lanes_to_result(lanes, language=None):
+    """Join a source's lanes into a model.transcribe-shaped result."""
+    lanes = sorted(lanes, key=lambda lane: lane.index)
+    segments = [segment for lane in lanes for segment in lane.segments]
+    return {
+        "text": "".join(s["text"] for s in segments),
+        "segments": segments,
+        "language": next((lane.language for lane in lanes if lane.language), language),
+    }
+
+
+def transcribe_files_batched(model, sources, batch_size=8, language="he", prompt=None, **decode_kwargs):
+    """
+    Transcribe several audio files (or arrays keyed by name) with windows from
+    all of them batched together. When there are fewer sources than batch_size,
+    long sources are split into several lanes to fill the batch.
+    Returns {source: {"text", "segments", "language"}}.
+    """
+    if not isinstance(sources, dict):
+        sources = {path: path for path in sources}
+
+    lanes_per_source = max(1, batch_size // len(sources))
+    lanes = []
+    for name, audio in sources.items():
+        lanes.extend(split_into_lanes(model, audio, name, lanes_per_source, language=language, prompt=prompt))
+
+    decode_lanes(model, lanes, batch_size=batch_size, **decode_kwargs)
+    return {
+        name: lanes_to_result([lane for lane in lanes if lane.source == name], language)
+        for name in sources
+    }
+
+
+def transcribe_batched(model, audio, batch_size=8, language="he", prompt=None, **decode_kwargs):
+    """Single-file convenience wrapper, shaped like model.transcribe's result."""
+    return transcribe_files_batched(model, {"audio": audio}, batch_size, language, prompt, **decode_kwargs)["audio"]
+
+
+def benchmark(model, paths, batch_sizes, language="he"):
+    """
+    Time each batch size against sequential model.transcribe with the same
+    decoding settings (no conditioning on previous text) and report how many
+    segments match it exactly and the word error rate between the two texts.
+    """
+    from decode_profiles import word_error_rate
+
+    audios = {path: whisper.load_audio(path) for path in paths}
+    audio_seconds = sum(len(audio) for audio in audios.values()) / SAMPLE_RATE
+
+    def segment_set(segments):
+        return [(round(s["start"], 2), round(s["end"], 2), s["text"]) for s in segments if s["text"].strip()]
+
+    print(f"📊 {len(paths)} files, {audio_seconds / 60:.1f} min of audio, device={model.device}, threads={torch.get_num_threads()}")
+    print(f"{'mode':>12} {'seconds':>9} {'RTF':>7} {'speedup':>8} {'same segs':>10} {'WER vs ref':>11}")
+
+    started = time.perf_counter()
+    reference = {
+        path: model.transcribe(audio, language=language, condition_on_previous_text=False,
+                               fp16=model.device.type == "cuda")
+        for path, audio in audios.items()
+    }
+    baseline = time.perf_counter() - started
+    print(f"{'transcribe':>12} {baseline:>9.1f} {baseline / audio_seconds:>7.3f} {1.0:>7.2f}x {'ref':>10} {'ref':>11}")
+
+    for size in batch_sizes:
+        started = time.perf_counter()
+        results = transcribe_files_batched(model, audios, batch_size=size, language=language)
+        elapsed = time.perf_counter() - started
+
+        matched = total = 0
+        errors = []
+        for path in paths:
+            ref_segments = segment_set(reference[path]["segments"])
+            ours = set(segment_set(results[path]["segments"]))
+            matched += sum(1 for s in ref_segments if s in ours)
+            total += len(ref_segments)
+            errors.append(word_error_rate(reference[path]["text"], results[path]["text"]))
+        same = f"{matched}/{total}"
+        print(f"{'batch ' + str(size):>12} {elapsed:>9.1f} {elapsed / audio_seconds:>7.3f} "
+              f"{baseline / elapsed:>7.2f}x {same:>10} {sum(errors) / len(errors):>11.3f}")
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched Whisper transcription and throughput benchmark")
+    parser.add_argument("command", choices=["run", "bench"])
+    parser.add_argument("audio", nargs="+", help="Audio files")
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--language", default="he")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Batch sizes to compare against model.transcribe in bench mode")
+    args = parser.parse_args()
+
+    print(f"🤖 Loading Whisper model: {args.model}")
+    model = whisper.load_model(args.model)
+
+    if args.command == "bench":
+        benchmark(model, args.audio, args.batch_sizes, args.language)
+        sys.exit(0)
+
+    started = time.perf_counter()
+    results = transcribe_files_batched(model, args.audio, batch_size=args.batch_size, language=args.language)
+    for path, result in results.items():
+        print(f"\n=== {path} ===")
+        for segment in result["segments"]:
+            print(f"[{segment['start']:8.2f} -> {segment['end']:8.2f}] {segment['text'].strip()}")
+    print(f"\n✅ Done in {time.perf_counter() - started:.1f}s")
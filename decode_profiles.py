@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Named decode-speed profiles (fast / balanced / accurate).
+Each profile bundles model size, beam/best-of, temperature fallback and
+torch CPU threads. Measured RTF and WER for each profile are published in
+profile_metrics.json by running the benchmark on a local reference set.
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import argparse
+
+FULL_FALLBACK = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+PROFILES = {
+    # Draft quality: smaller model, greedy, no fallback, no conditioning (no repetition loops to recover from)
+    "fast": {
+        "model": "small",
+        "beam_size": None,
+        "best_of": None,
+        "temperature": (0.0,),
+        "condition_on_previous_text": False,
+        "threads": 4,  # at most: the small model stops getting faster beyond a few threads
+    },
+    # What the scripts always did: medium model with Whisper's default decoding
+    # (model.transcribe(audio, language="he"): one sample per fallback temperature)
+    "balanced": {
+        "model": "medium",
+        "beam_size": None,
+        "best_of": None,
+        "temperature": FULL_FALLBACK,
+        "condition_on_previous_text": True,
+        "threads": None,  # torch's default, as before
+    },
+    # Archival quality: largest model with beam search
+    "accurate": {
+        "model": "large-v3",
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": FULL_FALLBACK,
+        "condition_on_previous_text": True,
+        "threads": None,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+METRICS_FILE = "profile_metrics.json"
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".webm", ".wav", ".opus", ".flac")
+
+
+def get_profile(name=None):
+    """Return the profile dict for a name (default: WHISPER_PROFILE or 'balanced')."""
+    name = name or os.environ.get("WHISPER_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}', choose from: {', '.join(PROFILES)}")
+    return dict(PROFILES[name], name=name)
+
+
+def available_cpus():
+    """CPUs this process may run on (respects container CPU sets, unlike os.cpu_count)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def thread_count(profile):
+    """
+    Torch CPU threads for a profile, or None to leave torch alone.
+    WHISPER_THREADS wins; an explicit OMP_NUM_THREADS is already applied by torch;
+    otherwise the profile's count caps torch's default. Never more than available_cpus().
+    """
+    import torch
+
+    available = available_cpus()
+    if os.environ.get("WHISPER_THREADS"):
+        return max(1, min(int(os.environ["WHISPER_THREADS"]), available))
+    if os.environ.get("OMP_NUM_THREADS"):
+        return None
+    default = torch.get_num_threads()
+    limit = min(default, available, profile["threads"] or default)
+    return limit if limit != default else None
+
+
+def apply_threading(profile):
+    """Set the torch CPU thread count for a profile (see thread_count)."""
+    threads = thread_count(profile)
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def transcribe_options(profile, model):
+    """Keyword arguments for model.transcribe for this profile."""
+    return {
+        "temperature": profile["temperature"],
+        "condition_on_previous_text": profile["condition_on_previous_text"],
+        "beam_size": profile["beam_size"],
+        "best_of": profile["best_of"],
+        "fp16": model.device.type == "cuda",
+    }
+
+
+def batched_options(profile):
+    """Keyword arguments for batched_transcribe.decode_lanes for this profile."""
+    return {
+        "temperatures": profile["temperature"],
+        "beam_size": profile["beam_size"],
+        "best_of": profile["best_of"],
+    }
+
+
+def load_metrics(path=METRICS_FILE):
+    """Return published measurements {profile: {...}}, or {} if never measured."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def normalize_words(text):
+    """Lowercase, drop punctuation and split into words for WER."""
+    return re.sub(r"[^\w\s]", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def find_reference_set(directory):
+    """Pairs of (audio_path, reference_text) where a same-named .txt exists."""
+    pairs = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        stem, ext = os.path.splitext(path)
+        if ext.lower() in AUDIO_EXTENSIONS and os.path.exists(stem + ".txt"):
+            with open(stem + ".txt", "r", encoding="utf-8") as f:
+                pairs.append((path, f.read()))
+    return pairs
+
+
+def measure_profile(profile, references, int8=False):
+    """
+    Transcribe the reference set with a profile and return RTF / WER.
+    The hypotheses are returned too, so fp32 and int8 runs can be compared.
+    """
+    import whisper
+    from whisper.audio import SAMPLE_RATE
+    from quantized_model import load_quantized_model, model_size_mb
+
+    apply_threading(profile)
+    if int8:
+        model = load_quantized_model(profile["model"])
+    else:
+        model = whisper.load_model(profile["model"], device="cpu")
+    options = transcribe_options(profile, model)
+
+    audio_seconds = 0.0
+    elapsed = 0.0
+    errors = []
+    hypotheses = []
+    for path, reference in references:
+        audio = whisper.load_audio(path)
+        audio_seconds += len(audio) / SAMPLE_RATE
+
+        started = time.perf_counter()
+        result = model.transcribe(audio, language="he", **options)
+        elapsed += time.perf_counter() - started
+
+        wer = word_error_rate(reference, result["text"])
+        errors.append(wer)
+        hypotheses.append(result["text"])
+        print(f"   {os.path.basename(path)}: WER {wer:.3f}")
+
+    metrics = {
+        "model": profile["model"] + (" (int8)" if int8 else ""),
+        "rtf": round(elapsed / audio_seconds, 3),
+        "wer": round(sum(errors) / len(errors), 3),
+        "size_mb": round(model_size_mb(model)),
+        "files": len(references),
+        "audio_minutes": round(audio_seconds / 60, 1),
+        "measured": time.strftime("%Y-%m-%d"),
+    }
+    return metrics, hypotheses
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Whisper decode-speed profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Show profiles and their published measurements")
+    bench = sub.add_parser("bench", help="Measure RTF and WER on a local reference set")
+    bench.add_argument("reference_dir", help="Directory with audio files and same-named .txt references")
+    bench.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    bench.add_argument("--int8", action="store_true", help="Also measure the int8 model and its drift from fp32")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        metrics = load_metrics()
+        for name, profile in PROFILES.items():
+            measured = metrics.get(name)
+            if measured:
+                summary = f"RTF {measured['rtf']:.3f}  WER {measured['wer']:.3f}  ({measured['files']} files, {measured['measured']})"
+            else:
+                summary = "not measured yet - run: python decode_profiles.py bench REFERENCE_DIR"
+            beam = profile["beam_size"] or "greedy"
+            print(f"{name:>9}: model={profile['model']:<9} beam={beam:<6} fallback={len(profile['temperature'])} temps  "
+                  f"threads={profile['threads'] or 'default':<7} {summary}")
+            quantized = metrics.get(name + "+int8")
+            if quantized:
+                print(f"{'+int8':>9}: RTF {quantized['rtf']:.3f}  WER {quantized['wer']:.3f} "
+                      f"({quantized['wer_delta']:+.3f})  drift vs fp32 {quantized['wer_vs_fp32']:.3f}  "
+                      f"{quantized['size_mb']} MB")
+        sys.exit(0)
+
+    references = find_reference_set(args.reference_dir)
+    if not references:
+        print(f"❌ No audio files with matching .txt references in {args.reference_dir}")
+        sys.exit(1)
+
+    metrics = load_metrics()
+    for name in args.profiles:
+        print(f"\n📊 Measuring profile '{name}' on {len(references)} files...")
+        metrics[name], fp32_texts = measure_profile(get_profile(name), references)
+        print(f"✅ {name}: RTF {metrics[name]['rtf']:.3f}  WER {metrics[name]['wer']:.3f}  {metrics[name]['size_mb']} MB")
+
+        if args.int8:
+            print(f"\n📊 Measuring profile '{name}' with the int8 model...")
+            int8_name = name + "+int8"
+            metrics[int8_name], int8_texts = measure_profile(get_profile(name), references, int8=True)
+            # Drift: how far int8 output moves from fp32 output, independent of reference quality
+            drift = [word_error_rate(a, b) for a, b in zip(fp32_texts, int8_texts)]
+            metrics[int8_name]["wer_vs_fp32"] = round(sum(drift) / len(drift), 3)
+            metrics[int8_name]["wer_delta"] = round(metrics[int8_name]["wer"] - metrics[name]["wer"], 3)
+            m = metrics[int8_name]
+            print(f"✅ {int8_name}: RTF {m['rtf']:.3f}  WER {m['wer']:.3f} ({m['wer_delta']:+.3f} vs fp32)  "
+                  f"drift vs fp32 output {m['wer_vs_fp32']:.3f}  {m['size_mb']} MB")
+
+    with open(METRICS_FILE, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+    print(f"\n📄 Published measurements to {METRICS_FILE}")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Offline stand-ins for YouTube, used by load_test.py.
+Provides drop-in fake modules for yt_dlp, youtube_transcript_api and
+(optionally) whisper, backed by a synthetic video catalogue with
+configurable latency, bandwidth, 429 / "Sign in" error rates and a
+ratio of videos without Hebrew transcripts. Nothing touches the network.
+"""
+
+import os
+import re
+import sys
+import time
+import json
+import types
+import random
+import hashlib
+import threading
+from dataclasses import dataclass
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class FakeYouTubeConfig:
+    latency: float = 0.3            # seconds per metadata/API request
+    latency_jitter: float = 0.5     # +/- fraction of latency
+    bandwidth_kbps: float = 4000.0  # audio download speed
+    audio_kbps: float = 128.0       # audio bitrate, sets download size
+    min_duration: float = 120.0     # video length range in seconds
+    max_duration: float = 3600.0
+    rate_429: float = 0.05          # probability a request is throttled
+    sign_in_rate: float = 0.02      # probability a request hits "Sign in to confirm you're not a bot"
+    missing_hebrew_ratio: float = 0.3
+    decode_rtf: float = 0.05        # fake Whisper seconds per audio second
+    seed: int = 0
+
+
+class FakeYouTube:
+    """Deterministic synthetic catalogue plus counters of what was served."""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    def _rng(self, *parts):
+        digest = hashlib.sha256("|".join(map(str, (self.config.seed,) + parts)).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def video(self, video_id):
+        """Stable properties of one synthetic video."""
+        rng = self._rng("video", video_id)
+        return {
+            "id": video_id,
+            "title": f"Fake episode {video_id}",
+            "duration": rng.uniform(self.config.min_duration, self.config.max_duration),
+            "has_hebrew": rng.random() >= self.config.missing_hebrew_ratio,
+        }
+
+    def wait(self, seconds=None):
+        """Sleep for one request's latency (time.sleep, so load_test can scale it)."""
+        if seconds is None:
+            jitter = self.config.latency * self.config.latency_jitter
+            seconds = max(0.0, self.config.latency + random.uniform(-jitter, jitter))
+        time.sleep(seconds)
+
+    def maybe_fail(self, kind):
+        """Raise-worthy error message for this request, or None."""
+        roll = random.random()
+        if roll < self.config.rate_429:
+            self.count(f"{kind}_429")
+            return "HTTP Error 429: Too Many Requests"
+        if roll < self.config.rate_429 + self.config.sign_in_rate:
+            self.count(f"{kind}_sign_in")
+            return "Sign in to confirm you're not a bot"
+        return None
+
+
+def video_id_from_url(url):
+    match = re.search(r'(?:v=|/)([a-zA-Z0-9_-]{11})', url)
+    return match.group(1) if match else url[-11:]
+
+
+def make_fake_links(count, seed=0):
+    """Synthetic watch URLs with valid-looking 11-character IDs."""
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    rng = random.Random(seed)
+    return [
+        "https://www.youtube.com/watch?v=" + "".join(rng.choice(alphabet) for _ in range(11))
+        for _ in range(count)
+    ]
+
+
+def build_fake_yt_dlp(world):
+    """Module object that can replace yt_dlp."""
+    module = types.ModuleType("yt_dlp")
+    utils = types.ModuleType("yt_dlp.utils")
+
+    class DownloadError(Exception):
+        pass
+
+    class YoutubeDL:
+        def __init__(self, params=None):
+            self.params = params or {}
+            world.count("ydl_created")
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.close()
+
+        def close(self):
+            pass
+
+        def prepare_filename(self, info):
+            template = self.params.get("outtmpl", "%(title)s.%(ext)s")
+            if isinstance(template, dict):
+                template = template.get("default", "%(title)s.%(ext)s")
+            home = self.params.get("paths", {}).get("home", "")
+            return os.path.join(home, template % info)
+
+        def extract_info(self, url, download=False):
+            world.count("extract_info")
+            world.wait()
+            error = world.maybe_fail("extract")
+            if error:
+                raise DownloadError(f"ERROR: [youtube] {video_id_from_url(url)}: {error}")
+            video = world.video(video_id_from_url(url))
+            info = {"id": video["id"], "title": video["title"], "duration": video["duration"], "ext": "m4a"}
+            if download:
+                info["requested_downloads"] = [{"filepath": self._download(info)}]
+            return info
+
+        def _download(self, info):
+            world.count("download")
+            world.wait()
+            error = world.maybe_fail("download")
+            if error:
+                raise DownloadError(f"ERROR: [youtube] {info['id']}: {error}")
+
+            size_kbit = info["duration"] * world.config.audio_kbps
+            world.wait(size_kbit / world.config.bandwidth_kbps)
+
+            filename = self.prepare_filename(info)
+            # Tiny placeholder: the fake whisper module only needs the duration
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump({"video_id": info["id"], "duration": info["duration"]}, f)
+            return filename
+
+        def download(self, urls):
+            for url in urls:
+                self.extract_info(url, download=True)
+            return 0
+
+    utils.DownloadError = DownloadError
+    module.utils = utils
+    module.YoutubeDL = YoutubeDL
+    return {"yt_dlp": module, "yt_dlp.utils": utils}
+
+
+def build_fake_transcript_api(world):
+    """Module objects that can replace youtube_transcript_api (instance API)."""
+    module = types.ModuleType("youtube_transcript_api")
+    formatters = types.ModuleType("youtube_transcript_api.formatters")
+
+    class TooManyRequests(Exception):
+        pass
+
+    class NoTranscriptFound(Exception):
+        pass
+
+    class Snippet:
+        def __init__(self, text, start, duration):
+            self.text = text
+            self.start = start
+            self.duration = duration
+
+    class YouTubeTranscriptApi:
+        def __init__(self, http_client=None):
+            self.http_client = http_client
+
+        def fetch(self, video_id, languages=("en",)):
+            world.count("transcript_fetch")
+            world.wait()
+            error = world.maybe_fail("transcript")
+            if error:
+                raise TooManyRequests(error)
+            video = world.video(video_id)
+            if not video["has_hebrew"] or not set(languages) & {"he", "iw"}:
+                world.count("transcript_missing_hebrew")
+                raise NoTranscriptFound(f"No transcript found for {video_id} in {list(languages)}")
+            step = 5.0
+            return [Snippet(f"שורה {i}", i * step, step) for i in range(int(video["duration"] // step))]
+
+        def list(self, video_id):
+            world.wait()
+            return []
+
+    class TextFormatter:
+        def format_transcript(self, transcript, **kwargs):
+            return "\n".join(snippet.text for snippet in transcript)
+
+    module.YouTubeTranscriptApi = YouTubeTranscriptApi
+    module.TooManyRequests = TooManyRequests
+    module.NoTranscriptFound = NoTranscriptFound
+    formatters.TextFormatter = TextFormatter
+    module.formatters = formatters
+    return {"youtube_transcript_api": module, "youtube_transcript_api.formatters": formatters}
+
+
+class FakeAudio:
+    """Stands in for a decoded signal: only its length (duration) matters."""
+
+    def __init__(self, duration):
+        self.duration = duration
+
+    def __len__(self):
+        return int(self.duration * SAMPLE_RATE)
+
+
+def build_fake_whisper(world):
+    """Module objects that can replace whisper: transcription takes decode_rtf x duration."""
+    module = types.ModuleType("whisper")
+    audio_module = types.ModuleType("whisper.audio")
+    audio_module.SAMPLE_RATE = SAMPLE_RATE
+    audio_module.N_SAMPLES = 30 * SAMPLE_RATE
+    audio_module.N_FRAMES = 3000
+
+    class FakeModel:
+        device = types.SimpleNamespace(type="cpu")
+
+        def transcribe(self, audio, language=None, **kwargs):
+            if isinstance(audio, str):
+                audio = load_audio(audio)
+            world.count("transcribe")
+            time.sleep(audio.duration * world.config.decode_rtf)
+            segments = [
+                {"start": float(start), "end": float(min(start + 30, audio.duration)), "text": f" קטע {start // 30}"}
+                for start in range(0, int(audio.duration), 30)
+            ]
+            return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": language}
+
+    def load_model(name, device=None, **kwargs):
+        world.count("load_model")
+        return FakeModel()
+
+    def load_audio(path, sr=SAMPLE_RATE):
+        with open(path, "r", encoding="utf-8") as f:
+            return FakeAudio(json.load(f)["duration"])
+
+    module.__version__ = "fake"
+    module.audio = audio_module
+    module.load_model = load_model
+    module.load_audio = load_audio
+    return {"whisper": module, "whisper.audio": audio_module}
+
+
+def install_fakes(world, fake_whisper=True):
+    """
+    Put the fake modules into sys.modules. Call before importing a.py,
+    hybrid_approach.py or local_with_auth.py.
+    """
+    modules = {}
+    modules.update(build_fake_yt_dlp(world))
+    modules.update(build_fake_transcript_api(world))
+    if fake_whisper:
+        modules.update(build_fake_whisper(world))
+    sys.modules.update(modules)
+    return modules
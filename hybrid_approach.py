@@ -9,8 +9,12 @@ import os
 import time
 import random
 import re
-from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
+from session_pool import get_transcript_api
+from transcript_archive import (
+    OUTPUT_FILES, OUTPUT_ARCHIVE, transcript_filename,
+    get_output_backend, get_default_archive,
+)
 
 def get_video_id_from_url(url):
     """Extract video ID from YouTube URL."""
@@ -33,7 +37,8 @@ def get_transcript_from_youtube(url):
         
         for lang in language_preferences:
             try:
-                transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=[lang])
+                # Shared API client: one keep-alive HTTP session for the whole run
+                transcript = get_transcript_api().fetch(video_id, languages=[lang])
                 
                 if transcript:
                     formatter = TextFormatter()
@@ -51,21 +56,25 @@ def get_transcript_from_youtube(url):
     except Exception as e:
         return None, None, f"Error: {e}"
 
-def save_transcript_to_file(transcript, video_title):
-    """Save transcript to file."""
+def save_transcript_to_file(transcript, video_title, video_id=None):
+    """Save transcript to file and/or the packed archive (see TRANSCRIPT_OUTPUT)."""
     if not transcript:
         return None
         
-    clean_title = video_title.replace(' ', '_').replace('|', '').replace('/', '_').replace('\\', '_').replace(':', '_').replace('?', '_').replace('*', '_').replace('<', '_').replace('>', '_').replace('"', '_')
-    filename = f"transcript_{clean_title}.txt"
+    backend = get_output_backend()
+    filename = None
     
-    if len(filename) > 200:
-        filename = filename[:200] + ".txt"
+    if backend != OUTPUT_FILES:
+        entry = get_default_archive().add(video_id or video_title, transcript, title=video_title)
+        print(f"📦 Transcript archived: {entry['video_id']}")
     
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(transcript)
+    if backend != OUTPUT_ARCHIVE:
+        filename = transcript_filename(video_title)
         
-    print(f"📄 Transcript saved: {filename}")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(transcript)
+            
+        print(f"📄 Transcript saved: {filename}")
     return filename
 
 def read_links_from_file(file_path):
@@ -123,7 +132,7 @@ if __name__ == "__main__":
         transcript, video_title, error = get_transcript_from_youtube(url)
         
         if transcript and video_title:
-            save_transcript_to_file(transcript, video_title)
+            save_transcript_to_file(transcript, video_title, get_video_id_from_url(url))
             successful_count += 1
         else:
             print(f"❌ No Hebrew transcript: {error}")
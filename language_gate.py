@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Early language-detection gate.
+Runs Whisper language detection and speech detection on a few sampled
+30-second windows, so English or music-only videos are skipped before the
+full Hebrew transcription is paid for.
+"""
+
+import os
+import sys
+from dataclasses import dataclass, field
+
+import torch
+import whisper
+from whisper.audio import SAMPLE_RATE, N_SAMPLES
+
+TARGET_LANGUAGE = "he"
+NO_SPEECH_THRESHOLD = 0.6
+
+
+@dataclass
+class GateResult:
+    passed: bool
+    reason: str
+    language: str = None  # most likely language over the speech windows
+    target_probability: float = 0.0
+    speech_windows: int = 0
+    windows: list = field(default_factory=list)  # (offset, language, target_prob, no_speech_prob)
+
+
+def gate_settings():
+    """Read gate configuration from the environment."""
+    return {
+        "enabled": os.environ.get("LANGUAGE_GATE", "1").lower() not in ("0", "false", "off", "no"),
+        "threshold": float(os.environ.get("LANGUAGE_GATE_THRESHOLD", "0.5")),
+        "windows": int(os.environ.get("LANGUAGE_GATE_WINDOWS", "3")),
+    }
+
+
+def sample_window_offsets(num_samples, num_windows):
+    """Evenly spread window start positions, away from intros and outros."""
+    if num_samples <= N_SAMPLES or num_windows <= 1:
+        return [0]
+    last_start = num_samples - N_SAMPLES
+    return sorted({int(last_start * (i + 1) / (num_windows + 1)) for i in range(num_windows)})
+
+
+def check_language(model, audio, target=TARGET_LANGUAGE, threshold=0.5, num_windows=3):
+    """
+    Check whether audio (path or 16 kHz array) is speech in the target language.
+    All sampled windows go through the model as one batch, decoding a single token.
+    """
+    if isinstance(audio, str):
+        audio = whisper.load_audio(audio)
+
+    offsets = sample_window_offsets(len(audio), num_windows)
+    mel = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[start:start + N_SAMPLES]), model.dims.n_mels)
+        for start in offsets
+    ]).to(model.device)
+
+    options = whisper.DecodingOptions(
+        language=None,
+        without_timestamps=True,
+        sample_len=1,
+        fp16=model.device.type == "cuda",
+    )
+    results = whisper.decode(model, mel, options)
+
+    windows = []
+    speech_probs = []
+    for start, result in zip(offsets, results):
+        target_prob = result.language_probs.get(target, 0.0)
+        windows.append((start / SAMPLE_RATE, result.language, target_prob, result.no_speech_prob))
+        if result.no_speech_prob < NO_SPEECH_THRESHOLD:
+            speech_probs.append(result.language_probs)
+
+    if not speech_probs:
+        return GateResult(False, f"no speech detected in {len(windows)} sampled windows (music-only?)",
+                          windows=windows)
+
+    averaged = {}
+    for probs in speech_probs:
+        for language, prob in probs.items():
+            averaged[language] = averaged.get(language, 0.0) + prob / len(speech_probs)
+    language = max(averaged, key=averaged.get)
+    target_probability = averaged.get(target, 0.0)
+
+    if target_probability < threshold:
+        reason = (f"detected '{language}' ({averaged[language]:.2f}); "
+                  f"'{target}' probability {target_probability:.2f} below threshold {threshold:.2f}")
+        return GateResult(False, reason, language, target_probability, len(speech_probs), windows)
+
+    return GateResult(True, f"'{target}' probability {target_probability:.2f}",
+                      language, target_probability, len(speech_probs), windows)
+
+
+def record_skipped_link(url, result, filename="skipped_links.txt"):
+    """
+    Append a skipped URL with its reason. The reason goes on a comment line,
+    so the file can be fed back as a links file (e.g. to another pipeline).
+    """
+    is_new = not os.path.exists(filename)
+    with open(filename, "a", encoding="utf-8") as f:
+        if is_new:
+            f.write("# Videos skipped by the language gate\n")
+            f.write("# Each URL is preceded by the reason it was skipped\n\n")
+        f.write(f"# [{result.language or 'no-speech'}] {result.reason}\n")
+        f.write(f"{url}\n")
+
+
+# Main execution
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python language_gate.py AUDIO_FILE [AUDIO_FILE ...]")
+        sys.exit(1)
+
+    settings = gate_settings()
+    model_name = os.environ.get("LANGUAGE_GATE_MODEL", "medium")
+    print(f"🤖 Loading Whisper model: {model_name}")
+    model = whisper.load_model(model_name)
+
+    for path in sys.argv[1:]:
+        result = check_language(model, path, threshold=settings["threshold"], num_windows=settings["windows"])
+        status = "✅ PASS" if result.passed else "⏭️  SKIP"
+        print(f"{status} {path}: {result.reason}")
+        for offset, language, target_prob, no_speech in result.windows:
+            print(f"    @{offset:7.1f}s  lang={language}  he={target_prob:.2f}  no_speech={no_speech:.2f}")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test.
+Drives the real pipeline code of a.py, hybrid_approach.py or local_with_auth.py
+through the shared work queue against fake_youtube.py, with thousands of
+synthetic links, then reports throughput, tail latency and failure handling.
+
+All sleeps (the scripts' anti-bot delays and the fake network) are scaled by
+--time-scale, so a multi-day backfill can be simulated in minutes. Reported
+times are simulated seconds (wall time / time scale).
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+import threading
+import collections
+import contextlib
+
+from fake_youtube import FakeYouTube, FakeYouTubeConfig, install_fakes, make_fake_links, video_id_from_url
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def scale_sleep(time_scale):
+    """Make every time.sleep in the process (scripts and fakes) run time_scale times as long."""
+    real_sleep = time.sleep
+
+    def scaled_sleep(seconds):
+        real_sleep(max(0.0, seconds) * time_scale)
+
+    time.sleep = scaled_sleep
+    return real_sleep
+
+
+def configure_environment(workdir, args):
+    """Keep all output inside the work directory and switch off stages the fakes cannot feed."""
+    os.environ.setdefault("TRANSCRIPT_OUTPUT", "archive")
+    os.environ["TRANSCRIPT_ARCHIVE_DIR"] = workdir
+    os.environ["AUDIO_CACHE_DIR"] = os.path.join(workdir, "audio_cache")
+    os.environ.setdefault("AUDIO_CACHE_MAX_BYTES", "0")
+    os.environ["FINGERPRINT_DIR"] = os.path.join(workdir, "fingerprints")
+    if not args.real_whisper:
+        # The fake decoder has no language probabilities or real signal to fingerprint
+        os.environ["LANGUAGE_GATE"] = "0"
+        os.environ["FINGERPRINT_CACHE"] = "0"
+        os.environ["WHISPER_BATCH_SIZE"] = "1"
+
+
+def build_process_fn(scenario, outcomes, outcomes_lock):
+    """Wrap one script's per-video function to record latency and outcome per attempt."""
+    from work_queue import DONE
+    if scenario == "a":
+        import a
+        process = a.process_youtube_link
+    elif scenario == "local":
+        import local_with_auth
+
+        def process(url, count, total):
+            outcome = local_with_auth.process_video_locally(url, count, total)
+            time.sleep(2)  # delay between videos, as in the script's main loop
+            return outcome
+    else:
+        import hybrid_approach
+
+        def process(url, count, total):
+            time.sleep(random.uniform(0.5, 1.5))  # "be nice to YouTube" delay from the main loop
+            transcript, video_title, error = hybrid_approach.get_transcript_from_youtube(url)
+            if transcript and video_title:
+                hybrid_approach.save_transcript_to_file(transcript, video_title,
+                                                        hybrid_approach.get_video_id_from_url(url))
+                process.routed[url] = "transcript"
+            else:
+                process.routed[url] = "needs_audio"  # goes to remaining_links.txt, not a failure
+            return DONE
+        process.routed = {}
+
+    def timed(url, count, total):
+        started = time.perf_counter()
+        outcome = None
+        try:
+            outcome = process(url, count, total)
+            return outcome
+        finally:
+            with outcomes_lock:
+                outcomes.append((url, outcome == DONE, time.perf_counter() - started))
+
+    return timed, process
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test against a fake YouTube")
+    parser.add_argument("--scenario", choices=["a", "hybrid", "local"], default="a",
+                        help="a.py download+Whisper, hybrid_approach.py transcript API, or local_with_auth.py")
+    parser.add_argument("--links", type=int, default=2000, help="Number of synthetic links")
+    parser.add_argument("--links-file", help="Use URLs from a file instead of synthetic ones")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent queue workers (threads)")
+    parser.add_argument("--time-scale", type=float, default=0.001, help="Real seconds per simulated second")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--bandwidth-kbps", type=float, default=4000.0)
+    parser.add_argument("--rate-429", type=float, default=0.05)
+    parser.add_argument("--sign-in-rate", type=float, default=0.02)
+    parser.add_argument("--missing-hebrew", type=float, default=0.3)
+    parser.add_argument("--decode-rtf", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Where downloads, queue and transcripts go (default: temp dir)")
+    parser.add_argument("--real-whisper", action="store_true", help="Use the real whisper module instead of the fake decoder")
+    parser.add_argument("--verbose", action="store_true", help="Show the scripts' own output")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    world = FakeYouTube(FakeYouTubeConfig(
+        latency=args.latency,
+        bandwidth_kbps=args.bandwidth_kbps,
+        rate_429=args.rate_429,
+        sign_in_rate=args.sign_in_rate,
+        missing_hebrew_ratio=args.missing_hebrew,
+        decode_rtf=args.decode_rtf,
+        seed=args.seed,
+    ))
+    install_fakes(world, fake_whisper=not args.real_whisper)
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="load_test_"))
+    os.makedirs(workdir, exist_ok=True)
+    configure_environment(workdir, args)
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+
+    if args.links_file:
+        with open(args.links_file, "r", encoding="utf-8") as f:
+            links = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        links = make_fake_links(args.links, args.seed)
+
+    from work_queue import WorkQueue, run_worker, DONE, SKIPPED, FAILED
+
+    queue = WorkQueue(os.path.join(workdir, "work_queue.db"), lease_seconds=120, max_attempts=args.max_attempts)
+    queue.enqueue(links)
+
+    outcomes = []
+    outcomes_lock = threading.Lock()
+    process_fn, inner = build_process_fn(args.scenario, outcomes, outcomes_lock)
+
+    print(f"🧪 Load test: scenario={args.scenario}, {len(links)} links, {args.workers} workers, "
+          f"time scale {args.time_scale}, workdir {workdir}")
+
+    real_sleep = scale_sleep(args.time_scale)
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with output:
+            threads = [
+                threading.Thread(target=run_worker, args=(queue, process_fn, f"worker-{i}"))
+                for i in range(args.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    wall = time.perf_counter() - started
+    time.sleep = real_sleep
+
+    # --- Report ---
+    scale = args.time_scale
+    simulated = wall / scale
+    latencies = [seconds / scale for _, _, seconds in outcomes]
+    successes = {}
+    for url, ok, _ in outcomes:
+        if ok:
+            successes[url] = successes.get(url, 0) + 1
+    stats = queue.stats()
+    attempts_per_url = collections.Counter(url for url, _, _ in outcomes)
+    retried = sum(1 for count in attempts_per_url.values() if count > 1)
+    duplicates = sum(1 for count in successes.values() if count > 1)
+    lost = len(links) - stats[DONE] - stats[SKIPPED] - stats[FAILED]
+
+    print("\n" + "=" * 60)
+    print("📊 LOAD TEST RESULTS")
+    print("=" * 60)
+    print(f"Links: {len(links)}   attempts: {len(outcomes)}   wall: {wall:.1f}s   simulated: {simulated / 3600:.2f} h")
+    print(f"Throughput: {stats[DONE] / simulated * 3600:.1f} videos per simulated hour "
+          f"({len(outcomes) / wall:.1f} attempts/s wall)")
+    print(f"Attempt latency (simulated s): p50 {percentile(latencies, 0.50):.1f}  "
+          f"p95 {percentile(latencies, 0.95):.1f}  p99 {percentile(latencies, 0.99):.1f}  max {max(latencies or [0]):.1f}")
+    print(f"Queue: {stats[DONE]} done, {stats[SKIPPED]} skipped, {stats[FAILED]} failed after {args.max_attempts} attempts, "
+          f"{stats['pending'] + stats['leased']} left over")
+    print(f"Retried URLs: {retried}   duplicate successes: {duplicates}   lost links: {lost}")
+
+    if args.scenario == "hybrid":
+        routed = list(inner.routed.values())
+        needs_audio = routed.count("needs_audio")
+        expected_missing = sum(1 for url in links if not world.video(video_id_from_url(url))["has_hebrew"])
+        print(f"Transcript API: {routed.count('transcript')} found, {needs_audio} sent to local processing "
+              f"({expected_missing} truly without Hebrew, {needs_audio - expected_missing} misrouted by errors)")
+
+    print("\nFake YouTube served:")
+    for name, count in sorted(world.counters.items()):
+        print(f"   {name:>28}: {count}")
+    print(f"\n📁 Work directory: {workdir}")
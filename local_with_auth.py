@@ -10,6 +10,31 @@ import random
 import re
 import whisper
 import yt_dlp
+import argparse
+from transcript_archive import (
+    OUTPUT_FILES, OUTPUT_ARCHIVE, transcript_filename,
+    get_output_backend, get_default_archive,
+)
+from session_pool import get_ydl_pool
+from audio_cache import get_default_cache as get_default_audio_cache, get_download_dir, discard_audio_file
+from audio_fingerprint import (
+    SAMPLE_RATE, compute_fingerprint, fingerprint_cache_enabled,
+    get_default_index as get_default_fingerprint_index,
+)
+from language_gate import gate_settings, check_language, record_skipped_link
+from work_queue import DONE, SKIPPED, RETRY
+from quantized_model import int8_enabled, load_quantized_model
+from decode_profiles import PROFILES, DEFAULT_PROFILE, get_profile, apply_threading, transcribe_options
+
+def get_video_id_from_url(url):
+    """Extract video ID from YouTube URL."""
+    video_id_match = re.search(r'(?:v=|/)([a-zA-Z0-9_-]{11})(?:\S+)?', url)
+    if video_id_match:
+        return video_id_match.group(1)
+    return None
+
+# yt-dlp format selector; also part of the audio cache key
+AUDIO_FORMAT = 'bestaudio/best'
 
 def download_audio_local_with_auth(url):
     """
@@ -17,12 +42,22 @@ def download_audio_local_with_auth(url):
     This works on your local computer where you can log into YouTube.
     """
     try:
+        # Already downloaded in an earlier run? Read it from the audio cache.
+        video_id = get_video_id_from_url(url)
+        cached = get_default_audio_cache().get(video_id, AUDIO_FORMAT) if video_id else None
+        if cached:
+            audio_path, cached_title = cached
+            print(f"💾 Using cached audio: {audio_path}")
+            return audio_path, cached_title or f"video_{video_id}"
+        
         print(f"🎵 Downloading audio locally: {url}")
         
         # Enhanced yt-dlp configuration for local use with authentication
         ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': '%(title)s.%(ext)s',
+            'format': AUDIO_FORMAT,
+            # Named by video ID in a per-process folder: concurrent workers never share files
+            'outtmpl': '%(id)s.%(ext)s',
+            'paths': {'home': get_download_dir()},
             'extractaudio': True,
             'audioformat': 'mp3',
             'audioquality': '192K',
@@ -59,31 +94,24 @@ def download_audio_local_with_auth(url):
         
         print("🔧 Trying local download with enhanced configuration...")
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # Pooled downloader: browser cookies and extractor state are loaded once per run
+        with get_ydl_pool().borrow(ydl_opts) as ydl:
             try:
-                # Get video info and title
-                print("📊 Getting video info...")
-                info = ydl.extract_info(url, download=False)
+                # Get video info and download the audio in one request
+                print("📊 Getting video info and downloading audio...")
+                info = ydl.extract_info(url, download=True)
                 video_title = info.get('title', 'Unknown Video')
                 print(f"📹 Video: {video_title}")
                 
-                # Download the audio
-                print("⬬ Downloading audio...")
-                ydl.download([url])
-                
-                # Find the downloaded file
-                import glob
-                possible_files = glob.glob(f"{video_title[:50]}*")
-                if not possible_files:
-                    possible_files = glob.glob("*.mp3") + glob.glob("*.m4a") + glob.glob("*.webm")
-                    if possible_files:
-                        output_file = max(possible_files, key=os.path.getctime)
-                    else:
-                        print("❌ Could not find downloaded file")
-                        return None, None
-                else:
-                    output_file = possible_files[0]
+                # yt-dlp reports exactly which file it wrote
+                downloads = info.get('requested_downloads') or [{}]
+                output_file = downloads[0].get('filepath') or ydl.prepare_filename(info)
+                if not os.path.exists(output_file):
+                    print("❌ Could not find downloaded file")
+                    return None, None
                 
+                if video_id:
+                    output_file = get_default_audio_cache().put(video_id, AUDIO_FORMAT, output_file, video_title)
                 print(f"✅ Audio downloaded: {output_file}")
                 return output_file, video_title
                 
@@ -106,42 +134,124 @@ def download_audio_local_with_auth(url):
         print(f"❌ Download error: {e}")
         return None, None
 
-def transcribe_with_whisper_local(audio_file):
-    """Transcribe audio to Hebrew using Whisper locally."""
-    if not audio_file:
+# Decode profile used for transcription (fast / balanced / accurate)
+ACTIVE_PROFILE = os.environ.get("WHISPER_PROFILE", DEFAULT_PROFILE)
+
+# Loaded Whisper models, reused across videos
+_loaded_models = {}
+
+def load_whisper_model(model_name="medium"):
+    """Load a Whisper model once per run."""
+    quantized = int8_enabled()
+    key = (model_name, quantized)
+    if key not in _loaded_models:
+        print(f"🤖 Loading Whisper model: {model_name}{' (int8)' if quantized else ''}")
+        if quantized:
+            _loaded_models[key] = load_quantized_model(model_name)
+        else:
+            _loaded_models[key] = whisper.load_model(model_name)
+    return _loaded_models[key]
+
+def passes_language_gate(audio, url):
+    """Skip non-Hebrew / music-only videos before full transcription."""
+    settings = gate_settings()
+    if not settings["enabled"]:
+        return True
+        
+    try:
+        model_name = os.environ.get("LANGUAGE_GATE_MODEL") or get_profile(ACTIVE_PROFILE)["model"]
+        model = load_whisper_model(model_name)
+        result = check_language(model, audio,
+                                threshold=settings["threshold"], num_windows=settings["windows"])
+    except Exception as e:
+        print(f"⚠️  Language check failed, transcribing anyway: {e}")
+        return True
+        
+    if result.passed:
+        print(f"🗣️  Language check passed: {result.reason}")
+        return True
+        
+    print(f"⏭️  Skipping video: {result.reason}")
+    record_skipped_link(url, result)
+    return False
+
+def reuse_known_transcript(audio, video_id):
+    """
+    If this audio was already transcribed (re-upload, mirror or a cut from an
+    episode), return the matching part of the stored transcript.
+    """
+    if not fingerprint_cache_enabled():
+        return None
+        
+    try:
+        segments, match = get_default_fingerprint_index().reuse_transcript(audio, exclude=video_id)
+    except Exception as e:
+        print(f"⚠️  Fingerprint lookup failed, transcribing normally: {e}")
+        return None
+        
+    if match is None:
+        return None
+        
+    print(f"♻️  Same audio as {match['video_id']} at {match['offset']:.1f}s - reusing its transcript")
+    # Register this copy too, so cuts of it are recognized later
+    remember_fingerprint(audio, video_id, None, segments)
+    return "".join(segment["text"] for segment in segments)
+
+def remember_fingerprint(audio, video_id, video_title, segments):
+    """Store the fingerprint and segments for future duplicate detection."""
+    if not fingerprint_cache_enabled():
+        return
+        
+    try:
+        get_default_fingerprint_index().add(video_id, compute_fingerprint(audio), segments,
+                                            title=video_title, duration=len(audio) / SAMPLE_RATE)
+    except Exception as e:
+        print(f"⚠️  Could not store audio fingerprint: {e}")
+
+def transcribe_with_whisper_local(audio_file, video_id=None, video_title=None):
+    """Transcribe audio (path or decoded array) to Hebrew using Whisper locally."""
+    if audio_file is None:
         return None
         
     try:
-        print("🤖 Loading Whisper model...")
-        model = whisper.load_model("medium")  # Good balance for Hebrew
+        profile = get_profile(ACTIVE_PROFILE)  # 'balanced' = medium, good balance for Hebrew
+        apply_threading(profile)
+        model = load_whisper_model(profile["model"])
         
-        print(f"🗣️  Transcribing: {audio_file}")
-        result = model.transcribe(audio_file, language="he")
+        print(f"🗣️  Transcribing (profile: {profile['name']})")
+        result = model.transcribe(audio_file, language="he", **transcribe_options(profile, model))
         
         transcript = result["text"]
         print("✅ Transcription completed!")
         
+        if video_id and not isinstance(audio_file, str):
+            remember_fingerprint(audio_file, video_id, video_title, result["segments"])
+        
         return transcript
         
     except Exception as e:
         print(f"❌ Transcription error: {e}")
         return None
 
-def save_transcript_to_file(transcript, video_title):
-    """Save transcript to file."""
+def save_transcript_to_file(transcript, video_title, video_id=None):
+    """Save transcript to file and/or the packed archive (see TRANSCRIPT_OUTPUT)."""
     if not transcript:
         return None
         
-    clean_title = video_title.replace(' ', '_').replace('|', '').replace('/', '_').replace('\\', '_').replace(':', '_').replace('?', '_').replace('*', '_').replace('<', '_').replace('>', '_').replace('"', '_')
-    filename = f"transcript_{clean_title}.txt"
+    backend = get_output_backend()
+    filename = None
     
-    if len(filename) > 200:
-        filename = filename[:200] + ".txt"
+    if backend != OUTPUT_FILES:
+        entry = get_default_archive().add(video_id or video_title, transcript, title=video_title)
+        print(f"📦 Transcript archived: {entry['video_id']}")
     
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(transcript)
+    if backend != OUTPUT_ARCHIVE:
+        filename = transcript_filename(video_title)
         
-    print(f"📄 Transcript saved: {filename}")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(transcript)
+            
+        print(f"📄 Transcript saved: {filename}")
     return filename
 
 def read_links_from_file(file_path):
@@ -155,7 +265,7 @@ def read_links_from_file(file_path):
         return []
 
 def process_video_locally(url, count, total):
-    """Process a single video locally with authentication."""
+    """Process a single video locally with authentication. Returns DONE, SKIPPED or RETRY."""
     print(f"\n{'='*60}")
     print(f"🎬 Processing video {count}/{total}")
     print(f"🔗 URL: {url}")
@@ -166,33 +276,56 @@ def process_video_locally(url, count, total):
         audio_file, video_title = download_audio_local_with_auth(url)
         
         if not audio_file or not video_title:
-            return False
+            return RETRY
         
-        # Step 2: Transcribe with Whisper
-        transcript = transcribe_with_whisper_local(audio_file)
+        video_id = get_video_id_from_url(url) or video_title
+        audio = whisper.load_audio(audio_file)  # decode once for all steps
         
-        if not transcript:
-            return False
+        # Step 2: Reuse the transcript if this audio was already transcribed
+        transcript = reuse_known_transcript(audio, video_id)
         
-        # Step 3: Save transcript
-        save_transcript_to_file(transcript, video_title)
+        if transcript is None:
+            # Step 3: Skip videos that are not Hebrew speech
+            if not passes_language_gate(audio, url):
+                discard_audio_file(audio_file)
+                return SKIPPED
+            
+            # Step 4: Transcribe with Whisper
+            transcript = transcribe_with_whisper_local(audio, video_id, video_title)
+            
+            if not transcript:
+                discard_audio_file(audio_file)
+                return RETRY
         
-        # Step 4: Clean up audio file
+        # Step 5: Save transcript
+        save_transcript_to_file(transcript, video_title, video_id)
+        
+        # Step 6: Clean up audio file (cached audio stays for later runs)
         try:
-            os.remove(audio_file)
-            print(f"🗑️  Cleaned up: {audio_file}")
+            if discard_audio_file(audio_file):
+                print(f"🗑️  Cleaned up: {audio_file}")
         except:
             pass
         
-        return True
+        return DONE
         
     except Exception as e:
         print(f"❌ Processing failed: {e}")
-        return False
+        return RETRY
 
 # Main execution
 if __name__ == "__main__":
-    input_file = "remaining_links.txt"
+    parser = argparse.ArgumentParser(description="Local processing with authentication")
+    parser.add_argument("--links", default="remaining_links.txt", help="File with URLs to process")
+    parser.add_argument("--int8", action="store_true",
+                        help="Use the int8 dynamic-quantized CPU model (same as WHISPER_INT8=1)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=ACTIVE_PROFILE,
+                        help="Decode profile: fast, balanced or accurate")
+    args = parser.parse_args()
+    ACTIVE_PROFILE = args.profile
+    if args.int8:
+        os.environ["WHISPER_INT8"] = "1"
+    input_file = args.links
     
     # Check if remaining links file exists
     if not os.path.exists(input_file):
@@ -209,15 +342,19 @@ if __name__ == "__main__":
     total = len(links)
     print(f"🚀 LOCAL PROCESSING WITH AUTHENTICATION")
     print(f"📊 Videos to process: {total}")
-    print(f"🤖 Using Whisper for Hebrew transcription")
+    print(f"🤖 Using Whisper for Hebrew transcription (profile: {ACTIVE_PROFILE})")
     print(f"🔐 Authentication: Available for YouTube login")
     
     successful = 0
+    skipped = 0
     failed = 0
     
     for i, url in enumerate(links, 1):
-        if process_video_locally(url, i, total):
+        outcome = process_video_locally(url, i, total)
+        if outcome == DONE:
             successful += 1
+        elif outcome == SKIPPED:
+            skipped += 1
         else:
             failed += 1
         
@@ -230,6 +367,7 @@ if __name__ == "__main__":
     print("🏁 LOCAL PROCESSING COMPLETE")
     print("="*60)
     print(f"✅ Successfully processed: {successful}")
+    print(f"⏭️  Skipped (not Hebrew speech): {skipped}")
     print(f"❌ Failed: {failed}")
     print(f"📈 Success rate: {(successful/total)*100:.1f}%")
     
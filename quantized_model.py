@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+CPU int8 dynamic quantization for the PyTorch Whisper model.
+The model's linear layers (attention projections and MLPs, most of the
+weights) are quantized to int8; activations are quantized on the fly.
+The quantized model is cached on disk so it is only built once per model.
+"""
+
+import os
+import sys
+
+import torch
+import whisper
+
+CACHE_DIR = os.environ.get("WHISPER_INT8_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "whisper"))
+
+
+def int8_enabled():
+    """WHISPER_INT8=1 switches the scripts to the quantized model."""
+    return os.environ.get("WHISPER_INT8", "0").lower() in ("1", "true", "on", "yes")
+
+
+def _cache_path(model_name, cache_dir):
+    return os.path.join(cache_dir, f"{model_name}-int8-dynamic.pt")
+
+
+def _plain_linears(module):
+    """
+    Replace whisper.model.Linear with torch.nn.Linear: quantize_dynamic only
+    matches the exact nn.Linear type, and on CPU fp32 the two compute the same.
+    """
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _plain_linears(child)
+
+
+def quantize_model(model):
+    """Quantize a CPU fp32 Whisper model to int8 in place (no second fp32 copy) and return it."""
+    model = model.cpu().float().eval()
+    _plain_linears(model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_quantized_model(model_name, cache_dir=CACHE_DIR):
+    """
+    Load the int8 model from the disk cache, or quantize and cache it.
+    The cache is rebuilt if it was written by another torch/whisper version.
+    """
+    path = _cache_path(model_name, cache_dir)
+    versions = {"torch": torch.__version__, "whisper": whisper.__version__}
+
+    if os.path.exists(path):
+        try:
+            cached = torch.load(path, map_location="cpu", weights_only=False)
+            if cached.get("versions") == versions:
+                print(f"Loaded cached int8 model: {path}")
+                return cached["model"].eval()
+            print("Cached int8 model was built with other versions, re-quantizing...")
+        except Exception as e:
+            print(f"Could not read cached int8 model ({e}), re-quantizing...")
+
+    print(f"Quantizing '{model_name}' to int8 (first time only)...")
+    model = quantize_model(whisper.load_model(model_name, device="cpu"))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save({"versions": versions, "model": model}, tmp_path)
+    os.replace(tmp_path, path)
+    print(f"Cached int8 model: {path}")
+    return model
+
+
+def model_size_mb(model):
+    """In-memory size of the model weights: parameters, buffers and int8 packed linear weights."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in model.modules():
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            tensors += [t for t in module._weight_bias() if t is not None]
+    return sum(t.numel() * t.element_size() for t in tensors) / 1024 ** 2
+
+
+# Main execution
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python quantized_model.py MODEL_NAME   (builds and caches the int8 model)")
+        sys.exit(1)
+
+    fp32 = whisper.load_model(sys.argv[1], device="cpu")
+    int8 = load_quantized_model(sys.argv[1])
+    print(f"fp32: {model_size_mb(fp32):.0f} MB   int8: {model_size_mb(int8):.0f} MB")
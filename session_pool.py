@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Long-lived downloader and HTTP sessions shared across the whole run.
+Instead of building a fresh yt_dlp.YoutubeDL (cookie loading, extractor
+setup, player JS download, TLS handshakes) for every video, configured
+instances are kept in a bounded pool and reused across videos and threads.
+"""
+
+import os
+import json
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+YTDLP_POOL_SIZE = int(os.environ.get("YTDLP_POOL_SIZE", "4"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "8"))
+
+
+def _options_key(options):
+    """Stable key for a yt-dlp options dict."""
+    return json.dumps(options, sort_keys=True, default=repr)
+
+
+class YoutubeDLPool:
+    """
+    Bounded pool of yt_dlp.YoutubeDL instances keyed by their options.
+    A borrowed instance is used by one thread at a time (YoutubeDL is not
+    thread-safe). When the pool is full, the least recently used idle
+    instance is closed to make room; if every instance is busy, borrow waits.
+    """
+
+    def __init__(self, max_size=YTDLP_POOL_SIZE):
+        self.max_size = max_size
+        self._idle = OrderedDict()  # id(ydl) -> (key, ydl), oldest first
+        self._busy = 0
+        self._cond = threading.Condition()
+        self.created = 0
+        self.reused = 0
+
+    def _create(self, options):
+        import yt_dlp
+        self.created += 1
+        return yt_dlp.YoutubeDL(options)
+
+    def _take_idle(self, key):
+        for ident, (idle_key, ydl) in self._idle.items():
+            if idle_key == key:
+                del self._idle[ident]
+                return ydl
+        return None
+
+    @contextmanager
+    def borrow(self, options):
+        """Borrow a YoutubeDL configured with these options."""
+        key = _options_key(options)
+        evicted = None
+        with self._cond:
+            while True:
+                ydl = self._take_idle(key)
+                if ydl is not None:
+                    self.reused += 1
+                    break
+                if self._busy + len(self._idle) < self.max_size:
+                    break
+                if self._idle:
+                    # Make room by dropping the least recently used idle instance
+                    _, (_, evicted) = self._idle.popitem(last=False)
+                    break
+                self._cond.wait()
+            self._busy += 1
+
+        if evicted is not None:
+            evicted.close()
+
+        try:
+            if ydl is None:
+                ydl = self._create(options)
+        except Exception:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify()
+            raise
+
+        try:
+            yield ydl
+        finally:
+            with self._cond:
+                self._busy -= 1
+                self._idle[id(ydl)] = (key, ydl)
+                self._cond.notify()
+
+    def close(self):
+        """Close every idle instance (saves cookies, closes connections)."""
+        with self._cond:
+            idle = [ydl for _, ydl in self._idle.values()]
+            self._idle.clear()
+        for ydl in idle:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+
+_ydl_pool = None
+_http_session = None
+_transcript_api = None
+_lock = threading.Lock()
+
+
+def get_ydl_pool():
+    """Process-wide YoutubeDL pool."""
+    global _ydl_pool
+    with _lock:
+        if _ydl_pool is None:
+            _ydl_pool = YoutubeDLPool()
+            atexit.register(_ydl_pool.close)
+        return _ydl_pool
+
+
+def get_http_session():
+    """
+    Process-wide requests.Session with keep-alive connection pooling.
+    The connection pool is bounded (HTTP_POOL_SIZE) and blocks instead of
+    opening extra connections, so it can be shared by worker threads.
+    """
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Language"] = "he,en-US;q=0.5"
+            _http_session = session
+            atexit.register(session.close)
+        return _http_session
+
+
+def get_transcript_api():
+    """Process-wide YouTubeTranscriptApi using the shared HTTP session."""
+    global _transcript_api
+    session = get_http_session()
+    with _lock:
+        if _transcript_api is None:
+            from youtube_transcript_api import YouTubeTranscriptApi
+            _transcript_api = YouTubeTranscriptApi(http_client=session)
+        return _transcript_api
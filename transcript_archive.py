@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Packed transcript archive.
+Stores every transcript as a compressed frame in one append-only pack file,
+with a small JSON-lines index keyed by video ID for random access.
+Loose transcript_*.txt files can still be exported as a compatibility view.
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import glob
+import threading
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available, zstd is optional
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single writer only
+    fcntl = None
+
+PACK_SUFFIX = ".pack"
+INDEX_SUFFIX = ".idx"
+
+# Output backends understood by the transcription scripts
+OUTPUT_FILES = "files"
+OUTPUT_ARCHIVE = "archive"
+OUTPUT_BOTH = "both"
+
+
+def transcript_filename(video_title):
+    """Build the loose transcript filename used by all the scripts."""
+    clean_title = video_title.replace(' ', '_').replace('|', '').replace('/', '_').replace('\\', '_').replace(':', '_').replace('?', '_').replace('*', '_').replace('<', '_').replace('>', '_').replace('"', '_')
+    filename = f"transcript_{clean_title}.txt"
+
+    if len(filename) > 200:
+        filename = filename[:200] + ".txt"
+
+    return filename
+
+
+def _compress(data):
+    """Compress one frame, returning (codec, payload)."""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec, payload):
+    """Decompress one frame written by _compress."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive contains zstd frames - run: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+def _truncate_torn_tail(index):
+    """
+    Drop a last line without a trailing newline (a writer killed mid-write),
+    so the next entry starts on a line of its own. Call with the lock held.
+    """
+    size = index.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    index.seek(size - 1)
+    if index.read(1) == b"\n":
+        return
+    # Walk back to the last complete line
+    position = size
+    while position > 0:
+        start = max(0, position - 4096)
+        index.seek(start)
+        newline = index.read(position - start).rfind(b"\n")
+        if newline != -1:
+            position = start + newline + 1
+            break
+        position = start
+    index.truncate(position)
+    index.seek(position)
+
+
+class TranscriptArchive:
+    """
+    Append-only transcript store: <name>.pack holds the compressed frames,
+    <name>.idx holds one JSON line per frame (video_id, title, offset, length, codec).
+    A later entry for the same video ID replaces the earlier one.
+    """
+
+    def __init__(self, directory=".", name="transcripts"):
+        self.directory = directory
+        self.pack_path = os.path.join(directory, name + PACK_SUFFIX)
+        self.index_path = os.path.join(directory, name + INDEX_SUFFIX)
+        self._entries = {}
+        self._index_pos = 0
+        self._lock = threading.Lock()
+        self._refresh_index()
+
+    def _refresh_index(self):
+        """Read index lines appended since the last refresh (possibly by another process)."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            f.seek(self._index_pos)
+            while True:
+                line = f.readline()
+                if not line or not line.endswith("\n"):
+                    break  # stop at a partially written last line
+                self._index_pos = f.tell()
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    self._entries[entry["video_id"]] = entry
+                except (ValueError, KeyError) as e:
+                    # A torn line from a crashed writer: skip it, the frames it did not index are lost anyway
+                    print(f"⚠️  Skipping unreadable line in {self.index_path}: {e}")
+
+    def add(self, video_id, transcript, title=None):
+        """Append a transcript and return its index entry."""
+        codec, payload = _compress(transcript.encode("utf-8"))
+
+        with self._lock:
+            os.makedirs(self.directory or ".", exist_ok=True)
+            with open(self.pack_path, "ab") as pack:
+                if fcntl is not None:
+                    fcntl.flock(pack, fcntl.LOCK_EX)
+                try:
+                    pack.seek(0, os.SEEK_END)
+                    offset = pack.tell()
+                    pack.write(payload)
+                    pack.flush()
+                    os.fsync(pack.fileno())
+
+                    # The index line is written only after the frame is on disk,
+                    # so a crash leaves at most an unreferenced frame behind.
+                    entry = {
+                        "video_id": video_id,
+                        "title": title or video_id,
+                        "offset": offset,
+                        "length": len(payload),
+                        "codec": codec,
+                        "size": len(transcript),
+                        "created": int(time.time()),
+                    }
+                    with open(self.index_path, "ab+") as index:
+                        _truncate_torn_tail(index)
+                        index.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+                        index.flush()
+                        os.fsync(index.fileno())
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(pack, fcntl.LOCK_UN)
+
+            self._refresh_index()
+            self._entries[video_id] = entry
+        return entry
+
+    def get_entry(self, video_id):
+        """Return the index entry for a video ID, or None."""
+        with self._lock:
+            if video_id not in self._entries:
+                self._refresh_index()
+            return self._entries.get(video_id)
+
+    def _read_frame(self, pack, entry):
+        pack.seek(entry["offset"])
+        return _decompress(entry["codec"], pack.read(entry["length"])).decode("utf-8")
+
+    def get(self, video_id):
+        """Return the transcript text for a video ID, or None (one seek + one read)."""
+        entry = self.get_entry(video_id)
+        if entry is None:
+            return None
+        with open(self.pack_path, "rb") as pack:
+            return self._read_frame(pack, entry)
+
+    def __contains__(self, video_id):
+        return self.get_entry(video_id) is not None
+
+    def __len__(self):
+        with self._lock:
+            self._refresh_index()
+            return len(self._entries)
+
+    def entries(self):
+        """Return all current index entries in pack order."""
+        with self._lock:
+            self._refresh_index()
+            return sorted(self._entries.values(), key=lambda e: e["offset"])
+
+    def iter_transcripts(self):
+        """Stream (entry, text) pairs in pack order, one frame in memory at a time."""
+        entries = self.entries()
+        if not entries:
+            return
+        with open(self.pack_path, "rb") as pack:
+            for entry in entries:
+                yield entry, self._read_frame(pack, entry)
+
+    def export_loose(self, directory="."):
+        """Write every transcript as a loose transcript_<title>.txt file."""
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for entry, text in self.iter_transcripts():
+            path = os.path.join(directory, transcript_filename(entry["title"]))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            count += 1
+        return count
+
+
+_default_archive = None
+
+
+def get_output_backend():
+    """Return the configured output backend (TRANSCRIPT_OUTPUT: files, archive or both)."""
+    backend = os.environ.get("TRANSCRIPT_OUTPUT", OUTPUT_FILES).strip().lower()
+    if backend not in (OUTPUT_FILES, OUTPUT_ARCHIVE, OUTPUT_BOTH):
+        print(f"Unknown TRANSCRIPT_OUTPUT '{backend}', falling back to '{OUTPUT_FILES}'")
+        backend = OUTPUT_FILES
+    return backend
+
+
+def get_default_archive():
+    """Return the process-wide archive (TRANSCRIPT_ARCHIVE_DIR, default: current directory)."""
+    global _default_archive
+    if _default_archive is None:
+        _default_archive = TranscriptArchive(os.environ.get("TRANSCRIPT_ARCHIVE_DIR", "."))
+    return _default_archive
+
+
+def import_loose_files(archive, pattern="transcript_*.txt"):
+    """Import existing loose transcript files, keyed by their file name."""
+    count = 0
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.basename(path)
+        title = name[len("transcript_"):-len(".txt")] if name.startswith("transcript_") else name
+        with open(path, "r", encoding="utf-8") as f:
+            archive.add(title, f.read(), title=title)
+        count += 1
+    return count
+
+
+# Main execution
+if __name__ == "__main__":
+    usage = (
+        "Usage:\n"
+        "  python transcript_archive.py list\n"
+        "  python transcript_archive.py get VIDEO_ID\n"
+        "  python transcript_archive.py export [DIRECTORY]\n"
+        "  python transcript_archive.py import [GLOB]"
+    )
+
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    archive = get_default_archive()
+    command = sys.argv[1]
+
+    if command == "list":
+        for entry in archive.entries():
+            print(f"{entry['video_id']}\t{entry['size']} chars\t{entry['title']}")
+        print(f"📦 {len(archive)} transcripts in {archive.pack_path}")
+    elif command == "get" and len(sys.argv) == 3:
+        text = archive.get(sys.argv[2])
+        if text is None:
+            print(f"❌ Not in archive: {sys.argv[2]}")
+            sys.exit(1)
+        print(text)
+    elif command == "export":
+        target = sys.argv[2] if len(sys.argv) > 2 else "."
+        count = archive.export_loose(target)
+        print(f"📄 Exported {count} transcripts to {target}")
+    elif command == "import":
+        pattern = sys.argv[2] if len(sys.argv) > 2 else "transcript_*.txt"
+        count = import_loose_files(archive, pattern)
+        print(f"📦 Imported {count} loose transcripts into {archive.pack_path}")
+    else:
+        print(usage)
+        sys.exit(1)
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Resident transcription service.
+Keeps the Whisper model warm and accepts jobs over a local HTTP API or a
+watched inbox file. Jobs are scheduled by priority down to single decoding
+steps, so an interactive request overtakes bulk backfill even while a bulk job
+is being transcribed, and partial segments are visible while a job runs.
+Like a.py, a job first looks its audio up in the fingerprint index and stores
+its fingerprint when done. Windows are decoded without conditioning on the
+previous window's text (see batched_transcribe.py), whatever the profile says.
+
+    POST /jobs          {"url": "...", "priority": "interactive" | "bulk" | <int>}
+    GET  /jobs          all jobs (without segments)
+    GET  /jobs/<id>     status and segments (?since=N returns segments from index N)
+    GET  /health
+"""
+
+import os
+import time
+import json
+import heapq
+import argparse
+import itertools
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import a
+from batched_transcribe import split_into_lanes, iter_decode_steps, lanes_to_result
+from decode_profiles import PROFILES, get_profile, apply_threading, batched_options
+
+PRIORITIES = {"interactive": 0, "normal": 5, "bulk": 10}
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+TRANSCRIBING = "transcribing"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class TranscriptionService:
+    """
+    Priority job queue, download workers and one model thread.
+    Workers download in parallel and hand each job to the model thread as a
+    generator of steps (language check, one batched decoding step, ...). The
+    model thread always runs the next step of the most urgent active job. It is
+    the only thread that touches the model: Whisper's key/value cache hooks
+    live on the shared model modules, so two concurrent decodes would
+    overwrite each other's cache.
+    """
+
+    def __init__(self, profile_name, workers=1, batch_size=4):
+        self.profile = get_profile(profile_name)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.jobs = {}
+        self._pending = []   # heap of (priority, sequence, job_id)
+        self._started = {}   # job_id -> priority, from download until the model is done with it
+        self._active = {}    # job_id -> (priority, sequence, steps) waiting for the model
+        self._schedule = threading.Condition()
+        self._sequence = itertools.count()  # FIFO within one priority
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.model = None
+
+    def warm_up(self):
+        """Load the model once; every job reuses it."""
+        a.ACTIVE_PROFILE = self.profile["name"]
+        apply_threading(self.profile)
+        self.model = a.load_whisper_model(self.profile["model"])
+        print(f"🔥 Model '{self.profile['model']}' loaded (profile: {self.profile['name']})")
+        if self.profile["condition_on_previous_text"]:
+            print("ℹ️  Step decoding does not condition on previous text; the rest of the profile applies")
+
+    def submit(self, url, priority="bulk", source="http"):
+        """Queue a URL and return the new job's public view."""
+        if isinstance(priority, str):
+            if priority not in PRIORITIES:
+                raise ValueError(f"Unknown priority '{priority}', use one of {', '.join(PRIORITIES)} or a number")
+            priority = PRIORITIES[priority]
+
+        job_id = f"{int(time.time())}-{next(self._ids)}"
+        job = {
+            "id": job_id,
+            "url": url,
+            "priority": int(priority),
+            "source": source,
+            "status": QUEUED,
+            "title": None,
+            "segments": [],
+            "progress": 0.0,
+            "error": None,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+        with self._schedule:
+            heapq.heappush(self._pending, (job["priority"], next(self._sequence), job_id))
+            self._schedule.notify_all()
+        print(f"📥 Job {job_id} queued (priority {job['priority']}, {source}): {url}")
+        return self.view(job_id, with_segments=False)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+
+    def view(self, job_id, with_segments=True, since=0):
+        """JSON-safe snapshot of one job."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if k != "segments"}
+            snapshot["segment_count"] = len(job["segments"])
+            if with_segments:
+                snapshot["segments"] = list(job["segments"][since:])
+            if job["status"] == QUEUED:
+                snapshot["queue_position"] = sum(
+                    1 for other in self.jobs.values()
+                    if other["status"] == QUEUED and (other["priority"], other["created"]) < (job["priority"], job["created"])
+                )
+        return snapshot
+
+    def list_jobs(self):
+        with self._lock:
+            ids = list(self.jobs)
+        return [self.view(job_id, with_segments=False) for job_id in ids]
+
+    def queued_count(self):
+        with self._schedule:
+            return len(self._pending)
+
+    def _decode_steps(self, job_id, audio):
+        """
+        Decode in batched steps, yielding after each one; finished segments are
+        published in the job as they come. Returns the model.transcribe-shaped result.
+        """
+        lanes = split_into_lanes(self.model, audio, job_id, lanes=self.batch_size, language="he")
+        total_frames = sum(lane.content_frames for lane in lanes)
+        options = batched_options(self.profile)
+
+        for _ in iter_decode_steps(self.model, lanes, batch_size=self.batch_size, **options):
+            # Publish finished lanes plus the one in progress, so segments stay in time order
+            published = []
+            for lane in lanes:
+                published.extend(lane.segments)
+                if not lane.done:
+                    break
+            decoded = sum(min(lane.seek, lane.content_frames) for lane in lanes)
+            self._update(job_id, segments=published, progress=round(decoded / max(total_frames, 1), 3))
+            yield
+
+        return lanes_to_result(lanes)
+
+    def _job_steps(self, job_id, url, audio_file, video_title):
+        """Everything after the download, as steps for the model thread (same order as a.py)."""
+        import whisper
+
+        try:
+            video_id = a.get_video_id_from_url(url) or video_title
+            audio = whisper.load_audio(audio_file)
+
+            transcript = a.reuse_known_transcript(audio, video_id)
+            if transcript is None:
+                yield
+                if not a.passes_language_gate(audio, url):
+                    self._update(job_id, status=SKIPPED, error="language check failed (see skipped_links.txt)",
+                                 finished=time.time())
+                    return
+                yield
+
+                result = yield from self._decode_steps(job_id, audio)
+                if not result["text"].strip():
+                    self._update(job_id, status=FAILED, error="transcription produced no text", finished=time.time())
+                    return
+                transcript = result["text"]
+                a.remember_fingerprint(audio, video_id, video_title, result["segments"])
+
+            a.save_transcript_to_file(transcript, video_title, video_id)
+            self._update(job_id, status=DONE, progress=1.0, finished=time.time())
+        finally:
+            a.discard_audio_file(audio_file)
+
+    def _next_job(self):
+        """
+        Wait until the most urgent queued job may start, and take it. A job may
+        start while fewer than `workers` jobs of the same or a more urgent
+        priority are in progress, so bulk jobs never hold back interactive ones.
+        """
+        with self._schedule:
+            while True:
+                if self._pending:
+                    priority = self._pending[0][0]
+                    if sum(1 for other in self._started.values() if other <= priority) < self.workers:
+                        break
+                self._schedule.wait()
+            priority, sequence, job_id = heapq.heappop(self._pending)
+            self._started[job_id] = priority
+            return priority, sequence, job_id
+
+    def _finish(self, job_id):
+        with self._schedule:
+            self._started.pop(job_id, None)
+            self._active.pop(job_id, None)
+            self._schedule.notify_all()
+
+    def _worker(self):
+        """Download jobs and hand them to the model thread."""
+        while True:
+            priority, sequence, job_id = self._next_job()
+            url = self.jobs[job_id]["url"]
+            self._update(job_id, status=DOWNLOADING, started=time.time())
+            try:
+                audio_file, video_title = a.download_audio_from_youtube(url)
+            except Exception as e:
+                audio_file, video_title = None, None
+                print(f"❌ Job {job_id} download failed: {e}")
+            if not audio_file or not video_title:
+                self._update(job_id, status=FAILED, error="download failed", finished=time.time())
+                self._finish(job_id)
+                continue
+
+            self._update(job_id, title=video_title, status=TRANSCRIBING)
+            with self._schedule:
+                self._active[job_id] = (priority, sequence, self._job_steps(job_id, url, audio_file, video_title))
+                self._schedule.notify_all()
+
+    def _model_loop(self):
+        """Run one step at a time, always from the most urgent active job."""
+        while True:
+            with self._schedule:
+                while not self._active:
+                    self._schedule.wait()
+                job_id = min(self._active, key=lambda other: self._active[other][:2])
+                steps = self._active[job_id][2]
+            try:
+                next(steps)
+                continue
+            except StopIteration:
+                pass
+            except Exception as e:
+                print(f"❌ Job {job_id} failed: {e}")
+                self._update(job_id, status=FAILED, error=str(e), finished=time.time())
+            self._finish(job_id)
+
+    def start(self):
+        threading.Thread(target=self._model_loop, daemon=True).start()
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+
+def watch_inbox(service, inbox_path, interval=5):
+    """
+    Poll an inbox file; each line is a URL, optionally prefixed by a priority
+    ("interactive https://..."). The file is renamed before reading, so lines
+    appended meanwhile land in a fresh inbox and are never lost.
+    """
+    processing_path = inbox_path + ".processing"
+    while True:
+        if os.path.exists(inbox_path):
+            try:
+                os.replace(inbox_path, processing_path)
+                with open(processing_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line or line.startswith("#"):
+                            continue
+                        parts = line.split()
+                        if len(parts) == 2:
+                            service.submit(parts[1], priority=parts[0], source="inbox")
+                        else:
+                            service.submit(parts[0], priority="bulk", source="inbox")
+                os.remove(processing_path)
+            except Exception as e:
+                print(f"⚠️  Could not read inbox {inbox_path}: {e}")
+        time.sleep(interval)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            parts = [p for p in parsed.path.split("/") if p]
+
+            if parts == ["health"]:
+                self._send(200, {"ok": True, "model": service.profile["model"],
+                                 "queued": service.queued_count()})
+            elif parts == ["jobs"]:
+                self._send(200, service.list_jobs())
+            elif len(parts) == 2 and parts[0] == "jobs":
+                since = int(parse_qs(parsed.query).get("since", ["0"])[0])
+                job = service.view(parts[1], since=since)
+                if job is None:
+                    self._send(404, {"error": "unknown job"})
+                else:
+                    self._send(200, job)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip("/") != "/jobs":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not request.get("url"):
+                    raise ValueError("missing 'url'")
+                job = service.submit(request["url"], priority=request.get("priority", "interactive"))
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            self._send(202, job)
+
+        def log_message(self, format, *args):
+            pass  # keep the console for job progress
+
+    return Handler
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident transcription service with a warm Whisper model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--inbox", default="inbox.txt", help="Watched file of URLs ('' to disable)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=a.ACTIVE_PROFILE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parallel downloads and jobs in progress per priority; model steps run one at a time, most urgent job first")
+    parser.add_argument("--batch-size", type=int, default=4, help="Windows decoded per step (long audio is split into this many spans)")
+    args = parser.parse_args()
+
+    service = TranscriptionService(args.profile, workers=args.workers, batch_size=args.batch_size)
+    service.warm_up()
+    service.start()
+
+    if args.inbox:
+        threading.Thread(target=watch_inbox, args=(service, args.inbox), daemon=True).start()
+        print(f"📂 Watching inbox: {args.inbox}")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"🚀 Transcription service on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+        server.server_close()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Shared work queue for running several transcriber containers on one link list.
+Jobs live in a SQLite database on a shared volume. A worker leases one URL at
+a time and keeps the lease alive with heartbeats; if a worker crashes its
+lease expires and the URL goes back to the queue, up to a retry limit.
+The default WAL journal needs every worker on the same host (containers
+sharing a host-local volume); for a database on a network filesystem set
+WORK_QUEUE_JOURNAL=DELETE.
+Videos the pipeline decides not to transcribe (language check) are marked
+skipped and never retried.
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+
+DEFAULT_DB = os.environ.get("WORK_QUEUE_DB", "work_queue.db")
+LEASE_SECONDS = int(os.environ.get("WORK_QUEUE_LEASE_SECONDS", "600"))
+MAX_ATTEMPTS = int(os.environ.get("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+# WAL relies on shared memory, which only works between processes on one host
+JOURNAL_MODE = os.environ.get("WORK_QUEUE_JOURNAL", "WAL").upper()
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# Outcomes returned by a process function (besides DONE and SKIPPED)
+RETRY = "retry"  # failed this time, try again up to max_attempts
+
+
+def default_worker_id():
+    """hostname:pid - unique per container when scaled with docker compose."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """SQLite-backed job queue with leases, heartbeats and retry counts."""
+
+    def __init__(self, path=DEFAULT_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 journal_mode=JOURNAL_MODE):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute(f"PRAGMA journal_mode={journal_mode}")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    url TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    last_error TEXT,
+                    updated REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, position)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation, so the heartbeat thread
+        # and the worker never share a connection.
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def enqueue(self, urls):
+        """Add URLs that are not in the queue yet. Returns how many were added."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            start = db.execute("SELECT COALESCE(MAX(position), 0) FROM jobs").fetchone()[0]
+            added = 0
+            for offset, url in enumerate(urls, 1):
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO jobs (url, position, updated) VALUES (?, ?, ?)",
+                    (url, start + offset, now),
+                )
+                added += cursor.rowcount
+            db.execute("COMMIT")
+        return added
+
+    def claim(self, worker_id):
+        """
+        Lease the next pending URL (or one whose lease expired).
+        Returns (url, attempt) or None when there is nothing left to do.
+        """
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")  # one claimer at a time across all containers
+            try:
+                while True:
+                    now = time.time()
+                    row = db.execute(
+                        "SELECT url, attempts, status FROM jobs "
+                        "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                        "ORDER BY attempts, position LIMIT 1",
+                        (PENDING, LEASED, now),
+                    ).fetchone()
+                    if row is None:
+                        return None
+
+                    url, attempts, status = row
+                    if status == LEASED and attempts >= self.max_attempts:
+                        # The worker holding the last attempt died
+                        db.execute(
+                            "UPDATE jobs SET status = ?, lease_owner = NULL, last_error = ?, updated = ? WHERE url = ?",
+                            (FAILED, "lease expired on final attempt", now, url),
+                        )
+                        continue
+
+                    db.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                        "lease_expires = ?, updated = ? WHERE url = ?",
+                        (LEASED, worker_id, now + self.lease_seconds, now, url),
+                    )
+                    return url, attempts + 1
+            finally:
+                db.execute("COMMIT")
+
+    def heartbeat(self, url, worker_id):
+        """Extend a lease. Returns False if the lease was lost to another worker."""
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE url = ? AND lease_owner = ? AND status = ?",
+                (now + self.lease_seconds, now, url, worker_id, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, url, worker_id):
+        """Mark a leased URL as done."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, last_error = NULL, updated = ? "
+                "WHERE url = ? AND lease_owner = ?",
+                (DONE, time.time(), url, worker_id),
+            )
+
+    def skip(self, url, worker_id, reason):
+        """Mark a leased URL as deliberately not transcribed; it is never retried."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, last_error = ?, updated = ? "
+                "WHERE url = ? AND lease_owner = ?",
+                (SKIPPED, reason, time.time(), url, worker_id),
+            )
+
+    def fail(self, url, worker_id, error):
+        """Release a leased URL after a failure: back to pending, or failed after the last attempt."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "lease_owner = NULL, lease_expires = NULL, last_error = ?, updated = ? "
+                "WHERE url = ? AND lease_owner = ?",
+                (self.max_attempts, FAILED, PENDING, str(error), time.time(), url, worker_id),
+            )
+
+    def requeue_failed(self):
+        """Give failed URLs a fresh set of attempts."""
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, updated = ? WHERE status = ?",
+                (PENDING, time.time(), FAILED),
+            )
+            return cursor.rowcount
+
+    def stats(self):
+        """Counts per status."""
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, SKIPPED: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def next_lease_expiry(self):
+        """Earliest expiry time of the current leases, or None if nothing is leased."""
+        with self._connect() as db:
+            return db.execute("SELECT MIN(lease_expires) FROM jobs WHERE status = ?", (LEASED,)).fetchone()[0]
+
+    def failed_jobs(self):
+        with self._connect() as db:
+            return db.execute(
+                "SELECT url, attempts, last_error FROM jobs WHERE status = ? ORDER BY position", (FAILED,)
+            ).fetchall()
+
+
+class LeaseHeartbeat:
+    """Background thread that keeps a lease alive while a video is processed."""
+
+    def __init__(self, queue, url, worker_id):
+        self.queue = queue
+        self.url = url
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(1, self.queue.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                if not self.queue.heartbeat(self.url, self.worker_id):
+                    print(f"⚠️  Lost lease on {self.url} - another worker may take it over")
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                print(f"⚠️  Heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue, process_fn, worker_id=None, idle_exit=True, poll_seconds=30):
+    """
+    Claim and process URLs until the queue is drained: nothing pending and nothing
+    leased, since a lease held by a crashed worker expires back into the queue.
+    process_fn(url, count, total) has the signature of a.py's process_youtube_link and
+    returns DONE, SKIPPED or RETRY (True / False are read as DONE / RETRY).
+    """
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    print(f"👷 Worker {worker_id} started")
+
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            stats = queue.stats()
+            if stats[PENDING] + stats[LEASED] == 0 and idle_exit:
+                break
+            # Other workers still hold leases: wait until the first one could expire
+            # (re-checking every poll_seconds in case they finish first)
+            expires = queue.next_lease_expiry()
+            delay = poll_seconds if expires is None else min(poll_seconds, max(1, expires - time.time()))
+            if expires is not None:
+                print(f"⏳ {stats[LEASED]} jobs leased by other workers, checking again in {delay:.0f}s")
+            time.sleep(delay)
+            continue
+
+        url, attempt = job
+        stats = queue.stats()
+        total = sum(stats.values())
+        print(f"\n👷 {worker_id} leased {url} (attempt {attempt}/{queue.max_attempts}, {stats[DONE]}/{total} done)")
+
+        heartbeat = LeaseHeartbeat(queue, url, worker_id)
+        try:
+            with heartbeat:
+                outcome = process_fn(url, stats[DONE] + 1, total)
+        except Exception as e:
+            outcome = RETRY
+            print(f"❌ Worker error on {url}: {e}")
+
+        if heartbeat.lost:
+            # Another worker owns the URL now; its result is the one that counts
+            print(f"⚠️  Lease on {url} was lost while processing - leaving the job to its new owner")
+        elif outcome is True or outcome == DONE:
+            queue.complete(url, worker_id)
+        elif outcome == SKIPPED:
+            queue.skip(url, worker_id, "skipped by the pipeline (see skipped_links.txt)")
+        else:
+            queue.fail(url, worker_id, "processing failed")
+        processed += 1
+
+    print(f"\n👷 Worker {worker_id} finished after {processed} jobs")
+    return processed
+
+
+def print_status(queue):
+    stats = queue.stats()
+    print(f"📊 Queue {queue.path}")
+    for status, count in stats.items():
+        print(f"   {status:>8}: {count}")
+    for url, attempts, error in queue.failed_jobs():
+        print(f"   ❌ {url} ({attempts} attempts): {error}")
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared work queue for transcriber containers")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite queue file on a shared volume")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enqueue = sub.add_parser("enqueue", help="Add links from a file (duplicates are ignored)")
+    enqueue.add_argument("links", nargs="?", default="links.txt")
+    work = sub.add_parser("work", help="Enqueue links (idempotent) and process the queue")
+    work.add_argument("--links", default="links.txt")
+    work.add_argument("--wait", action="store_true", help="Keep polling for new jobs instead of exiting")
+    sub.add_parser("status", help="Show queue counts and failed jobs")
+    sub.add_parser("requeue-failed", help="Retry failed jobs")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.db)
+
+    if args.command == "enqueue":
+        from a import read_links_from_file
+        added = queue.enqueue(read_links_from_file(args.links))
+        print(f"📥 Added {added} new links from {args.links}")
+        print_status(queue)
+    elif args.command == "work":
+        from a import read_links_from_file, process_youtube_link
+        if os.path.exists(args.links):
+            # Every container runs this on start; INSERT OR IGNORE makes it safe
+            added = queue.enqueue(read_links_from_file(args.links))
+            print(f"📥 Added {added} new links from {args.links}")
+        run_worker(queue, process_youtube_link, idle_exit=not args.wait)
+        print_status(queue)
+    elif args.command == "status":
+        print_status(queue)
+    elif args.command == "requeue-failed":
+        print(f"🔁 Requeued {queue.requeue_failed()} failed jobs")